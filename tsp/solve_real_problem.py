@@ -1,9 +1,25 @@
+import argparse
+import os
 import random
 import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from sklearn.cluster import KMeans
-from tsp.utils import generate_instance, evaluate_solution
-from tsp.rech_loc import recherche_locale
+from tsp.utils import Instance, generate_dense_instance, evaluate_solution, evaluate_solutions, create_shared_array, attach_shared_array
+from tsp.rech_loc import recherche_locale, listes_voisins, sous_matrice
+from tsp.lk import lin_kernighan
+from tsp.equilibrage import equilibrer_tournees
+from tsp.construct import tournee_initiale
+from tsp.bornes import borne_held_karp, ecart_certifie
+from tsp.branch_bound import tsp_branch_bound, TAILLE_MAX
+# Les modules du package importent instrumentation sans le préfixe tsp: on fait
+# de même pour partager les mêmes compteurs
+from instrumentation import activer, desactiver, actif, fusionner, phase
+
+# Pas de sous-gradient de la borne de Held-Karp de chaque tournée (rapport
+# optionnel, voir solve_real_problem): moins que la valeur par défaut de
+# borne_held_karp, pour que le rapport reste court devant l'optimisation
+ITERATIONS_BORNES = 30
 
 def cluster_clients_with_kmeans(coords, k_livreur):
     """Répartit les clients en k groupes géographiquement proches"""
@@ -22,56 +38,199 @@ def cluster_clients_with_kmeans(coords, k_livreur):
     
     return clusters
 
-def optimize(clusters, coords, dist):
-    """Optimise chaque tournée avec la recherche locale"""
+def optimize_tour(tournee, coords, dist, voisins=None, mouvements=("2opt",), methode="rech_loc", construction=None):
+    """Optimise une tournée par recherche locale ou par Lin-Kernighan (methode="lk"),
+    en partant de la tournée construite par l'heuristique 'construction' si elle est donnée.
+    Avec methode="exacte", la tournée de la recherche locale sert de tournée initiale
+    au branch-and-bound, qui la rend optimale (tournées d'au plus TAILLE_MAX sommets)"""
+    if construction is not None:
+        with phase("construction"):
+            tournee = tournee_initiale(tournee[:-1], coords, construction)
+    with phase("amelioration"):
+        if methode == "lk":
+            return lin_kernighan(tournee.copy(), dist, voisins)
+        tournee = recherche_locale(tournee.copy(), dist, voisins, mouvements)
+    if methode != "exacte" or len(tournee) - 1 > TAILLE_MAX:
+        return tournee
+    with phase("exacte"):
+        noeuds = tournee[:-1]
+        _, local = tsp_branch_bound(0, sous_matrice(noeuds, dist), initial_tour=list(range(len(noeuds))) + [0])
+    return [noeuds[i] for i in local]
+
+# Coordonnées partagées attachées par un processus fils
+_worker = {}
+
+def _init_worker(nom, shape, dtype, fichier=None):
+    if fichier is not None:
+        # Fichier .npy projeté en mémoire en lecture seule (voir fichiers.charger_coords)
+        _worker.update(segment=None, coords=np.load(fichier, mmap_mode="r"))
+        return
+    shm, coords = attach_shared_array(nom, shape, dtype)
+    _worker.update(segment=shm, coords=coords)
+
+def _optimize_cluster(noeuds, k_voisins, mouvements, methode, construction, mesurer):
+    """Optimise dans un processus fils la tournée des sommets 'noeuds' (dépôt en
+    tête): seule la sous-instance du cluster est construite, à partir des
+    coordonnées en mémoire partagée. Retourne (tournée, coût, temps, compteurs),
+    les compteurs d'instrumentation n'étant relevés que si mesurer est vrai."""
+    if mesurer:
+        activer()
+    debut = time.perf_counter()
+    sous_instance = Instance(_worker["coords"][noeuds])
+    voisins = listes_voisins(sous_instance.coords, k_voisins) if k_voisins else None
+    local = list(range(len(noeuds))) + [0]
+    local = optimize_tour(local, sous_instance.coords, sous_instance, voisins, mouvements, methode, construction)
+    cout = evaluate_solution(local, sous_instance)
+    temps = time.perf_counter() - debut
+    return [noeuds[i] for i in local], cout, temps, desactiver()
+
+def optimize(clusters, coords, dist, k_voisins=None, mouvements=("2opt",), methode="rech_loc", construction=None,
+             n_jobs=1, temps_clusters=None):
+    """Optimise chaque tournée avec la recherche locale
+    (restreinte aux k_voisins plus proches voisins si k_voisins est donné,
+    avec les mouvements choisis parmi "2opt", "oropt" et "3opt"),
+    ou avec Lin-Kernighan (methode="lk"), ou de façon exacte par branch-and-bound
+    (methode="exacte", voir optimize_tour), en partant de la tournée construite
+    par l'heuristique 'construction' ("ppv", "glouton", "hilbert") si elle est donnée.
+    Si n_jobs vaut plus de 1 (None: tous les cœurs), les clusters sont optimisés
+    en parallèle par un pool de processus qui lisent les coordonnées en mémoire
+    partagée (ou dans le fichier .npy d'où elles sont projetées en mémoire,
+    voir fichiers.charger_coords). Si temps_clusters est une liste, on y ajoute le temps de calcul
+    (en secondes) de chaque cluster."""
     depot = 0
     tournees = []
     costs = []
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    non_vides = [c for c in clusters if c]
+    
+    if n_jobs > 1 and len(non_vides) > 1:
+        fichier = getattr(coords, "filename", None)
+        if isinstance(coords, np.memmap) and str(fichier).endswith(".npy"):
+            # Coordonnées déjà projetées en mémoire: les processus ouvrent le même fichier
+            shm, initargs = None, (None, None, None, str(fichier))
+        else:
+            # Coordonnées en mémoire partagée: rien d'autre n'est transmis aux processus
+            points = np.asarray([coords[i] for i in range(len(coords))], dtype=np.int32)
+            shm, partage = create_shared_array(points.shape, points.dtype)
+            partage[...] = points
+            del partage
+            initargs = (shm.name, points.shape, points.dtype)
+        try:
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(non_vides)), initializer=_init_worker,
+                                     initargs=initargs) as pool:
+                futures = [pool.submit(_optimize_cluster, [depot] + cluster, k_voisins, mouvements,
+                                       methode, construction, actif()) if cluster else None
+                           for cluster in clusters]
+                resultats = [f.result() if f is not None else ([depot, depot], 0, 0.0, None) for f in futures]
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        for tournee_optimisee, cout, temps, compteurs in resultats:
+            fusionner(compteurs)
+            tournees.append(tournee_optimisee)
+            costs.append(cout)
+            if temps_clusters is not None:
+                temps_clusters.append(temps)
+            print(f"    → Coût après optimisation: {cout} ({temps:.3f}s)")
+        return tournees, costs
+    
+    # Listes de voisins candidats construites une seule fois pour l'instance
+    voisins = listes_voisins(coords, k_voisins) if k_voisins else None
     
     for cluster_idx, cluster in enumerate(clusters):
         if not cluster:
             tournees.append([depot, depot])
             costs.append(0)
+            if temps_clusters is not None:
+                temps_clusters.append(0.0)
             continue
         
-        # Tournée initiale: dépôt → clients → dépôt
-        tournee_initiale = [depot] + cluster + [depot]
+        debut = time.perf_counter()
+        # Tournée initiale: dépôt → clients → dépôt (reconstruite si construction est donné)
+        tournee_depart = [depot] + cluster + [depot]
         
-        # Optimisation par recherche locale
-        tournee_optimisee = recherche_locale(tournee_initiale.copy(), dist)
+        # Optimisation par recherche locale ou par Lin-Kernighan
+        tournee_optimisee = optimize_tour(tournee_depart, coords, dist, voisins, mouvements, methode, construction)
         cout = evaluate_solution(tournee_optimisee, dist)
+        temps = time.perf_counter() - debut
             
         tournees.append(tournee_optimisee)
         costs.append(cout)
+        if temps_clusters is not None:
+            temps_clusters.append(temps)
         
-        print(f"    → Coût après optimisation: {cout}")
+        print(f"    → Coût après optimisation: {cout} ({temps:.3f}s)")
     
     return tournees, costs
 
-def solve_real_problem(coords, dist, k_livreur):
-    """Résout le problème de logistique avec clustering + recherche locale"""
+def solve_real_problem(coords, dist, k_livreur, n_jobs=1, compteurs=None, bornes=True, construction="ppv"):
+    """Résout le problème de logistique avec clustering + recherche locale
+    + échanges entre tournées (tournées optimisées en parallèle sur n_jobs processus, voir optimize).
+    Chaque tournée part de la tournée construite par l'heuristique
+    'construction' ("ppv" par défaut, "glouton", "hilbert"; None: ordre des
+    clients dans le cluster).
+    Si compteurs est un dictionnaire, l'instrumentation est activée et les
+    compteurs (mouvements évalués et appliqués, passages, appels des solveurs,
+    temps de chaque phase) y sont ajoutés, regroupés par module.
+    Si bornes est vrai (par défaut), l'écart maximal d'une tournée à la borne
+    de Held-Karp de ses clients est affiché."""
+    if compteurs is not None:
+        activer(compteurs)
+    try:
+        return _solve_real_problem(coords, dist, k_livreur, n_jobs, bornes, construction)
+    finally:
+        if compteurs is not None:
+            desactiver()
+
+def _solve_real_problem(coords, dist, k_livreur, n_jobs, bornes, construction):
     start_time = time.time()
     n_clients = len(coords) - 1
     
     print(f"Problème: {n_clients} clients, {k_livreur} livreurs")
     
     # 1. Grouper les clients par proximité
-    clusters = cluster_clients_with_kmeans(coords, k_livreur)
+    with phase("clustering"):
+        clusters = cluster_clients_with_kmeans(coords, k_livreur)
     
-    # Affichage des groupes
+    # Affichage des groupes (coûts initiaux de toutes les tournées calculés en une fois)
+    couts_initiaux = evaluate_solutions([[0] + cluster + [0] for cluster in clusters], dist)
     total_clients = 0
     for i, cluster in enumerate(clusters):
         total_clients += len(cluster)
         print(f"  Groupe {i+1}: {len(cluster)} clients")
         
         if cluster:
-            cost = evaluate_solution([0] + cluster + [0], dist)
-            print(f"    Coût initial: {cost}")
+            print(f"    Coût initial: {couts_initiaux[i]}")
     
     print(f"  Total clients: {total_clients}/{n_clients}")
     
     # 2. Optimiser chaque tournée
-    tournees, costs = optimize(clusters, coords, dist)
+    tournees, costs = optimize(clusters, coords, dist, construction=construction, n_jobs=n_jobs)
+    
+    # 3. Échanger des clients entre tournées pour réduire la plus longue
+    with phase("equilibrage"):
+        tournees, costs = equilibrer_tournees(tournees, coords, dist)
+    print(f"  Coût maximal après échanges entre tournées: {max(costs)}")
+    
+    # 4. Borne inférieure de Held-Karp de chaque tournée (optionnelle): écart à
+    # la tournée optimale sur les mêmes clients, certifié si toutes les bornes
+    # ont été calculées sur le graphe complet
+    if bornes:
+        points = np.asarray(coords)
+        ecarts = []
+        certifies = True
+        with phase("bornes"):
+            for tournee, cost in zip(tournees, costs):
+                if len(tournee) > 3:
+                    borne, certifiee = borne_held_karp(points[tournee[:-1]], cout_tour=cost,
+                                                       iterations=ITERATIONS_BORNES)
+                    ecarts.append(ecart_certifie(cost, borne))
+                    certifies = certifies and certifiee
+        if ecarts:
+            qualificatif = "certifié" if certifies else "estimé (borne non certifiée)"
+            print(f"  Écart {qualificatif} maximal d'une tournée à son optimum: {max(ecarts):.2f}%")
     
     execution_time = time.time() - start_time
     max_cost = max(costs)
@@ -105,21 +264,32 @@ def display_results(tournees, costs):
 
 def main():
     """Génération d'une instance et résolution"""
+    parser = argparse.ArgumentParser(description="Résolution du problème de logistique")
+    parser.add_argument("--compteurs", action="store_true",
+                        help="active l'instrumentation et affiche les compteurs à la fin")
+    args = parser.parse_args()
+
     n_clients = 100  # Nombre de clients
     k_livreur = 10   # Nombre de livreurs
+    n_jobs = 1       # Processus pour optimiser les tournées (None: tous les cœurs)
+    compteurs = {} if args.compteurs else None  # Compteurs d'instrumentation (None: désactivée)
+    bornes = True    # Écart de chaque tournée à sa borne de Held-Karp
 
     print("Génération d'une instance...")
-    coords, dist = generate_instance(n_clients)
+    instance = generate_dense_instance(n_clients)
+    coords, dist = instance.coords, instance
     
     print("\n" + "="*40)
     print("RÉSOLUTION PROBLÈME DE LOGISTIQUE")
     print("="*40)
-    tournees, costs, max_cost, execution_time = solve_real_problem(coords, dist, k_livreur)
+    tournees, costs, max_cost, execution_time = solve_real_problem(coords, dist, k_livreur, n_jobs, compteurs, bornes)
     
     display_results(tournees, costs)
     
     print(f"\nTemps d'exécution: {execution_time:.2f}s")
     print(f"Coût maximal d'une tournée: {max_cost}")
+    if compteurs is not None:
+        print(f"Compteurs: {compteurs}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,75 +1,343 @@
-def solve_tsp_2approx(coords, dist):
+import bisect
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree, connected_components
+from scipy.spatial import cKDTree
+from utils import manhattan_matrix
+from rech_loc import sous_matrice
+from progdyn import layers_by_size
+
+
+def arbre_couvrant_prim(M, penalites=None, sans=None):
+    """
+    Algorithme de Prim sur une matrice de distances dense M (array numpy n x n)
+    en O(n²): à chaque étape, le sommet hors de l'arbre le plus proche de
+    l'arbre est trouvé et les distances à l'arbre sont mises à jour en une
+    opération vectorisée. M peut aussi être une Instance ou une LazyInstance,
+    dont les lignes M[u] sont alors lues (ou calculées) une à une.
+    Si penalites est donné, le poids de l'arête (i, j) est
+    M[i][j] + penalites[i] + penalites[j] (voir bornes.py); si sans est donné,
+    ce sommet est laissé hors de l'arbre.
+    Retourne l'arbre sous forme de listes d'adjacence.
+    """
+    if not hasattr(M, "coords"):
+        M = np.asarray(M)
+    n = len(M)
+    dans_arbre = np.zeros(n, dtype=bool)
+    cle = np.full(n, np.inf)   # distance de chaque sommet à l'arbre
+    parent = np.zeros(n, dtype=np.intp)
+    arbre_couvr_min = [[] for _ in range(n)]
+    u = 0 if sans != 0 else 1
+    dans_arbre[u] = True
+    if sans is not None:
+        dans_arbre[sans] = True
+    for _ in range(n - 1 - (sans is not None)):
+        ligne = M[u] if penalites is None else M[u] + penalites + penalites[u]
+        maj = (ligne < cle) & ~dans_arbre
+        cle[maj] = ligne[maj]
+        parent[maj] = u
+        cle[u] = np.inf
+        u = int(np.argmin(cle))
+        dans_arbre[u] = True
+        cle[u] = np.inf
+        p = int(parent[u])
+        arbre_couvr_min[p].append(u)
+        arbre_couvr_min[u].append(p)
+    return arbre_couvr_min
+
+
+def graphe_voisins(coords, k=10, noeuds=None):
+    """
+    Graphe des k plus proches voisins (distance de Manhattan) des points de
+    coords (ou des seuls sommets de 'noeuds'), obtenu à l'aide d'un k-d tree;
+    si ce graphe n'est pas connexe, k est doublé.
+    Retourne les arêtes sous forme de trois arrays (lignes, colonnes, poids),
+    en indices de coords.
+    """
+    noeuds = np.arange(len(coords)) if noeuds is None else np.asarray(noeuds)
+    points = np.asarray([coords[i] for i in noeuds.tolist()], dtype=np.float64)
+    n = len(points)
+    arbre = cKDTree(points)
+    while True:
+        kk = min(k, n - 1)
+        dist_k, idx = arbre.query(points, k=kk + 1, p=1)
+        lignes = np.repeat(np.arange(n), kk)
+        colonnes = idx[:, 1:].ravel()
+        poids = dist_k[:, 1:].ravel()
+        graphe = coo_matrix((poids + 1, (lignes, colonnes)), shape=(n, n))
+        if kk == n - 1 or connected_components(graphe, directed=False)[0] == 1:
+            return noeuds[lignes], noeuds[colonnes], poids
+        k *= 2
+
+
+def arbre_couvrant_graphe(n, lignes, colonnes, poids):
+    """
+    Arbre couvrant minimal du graphe (connexe sur ses sommets) donné par ses
+    arêtes, sommets numérotés 0..n-1. Les poids sont décalés pour être tous
+    strictement positifs (un poids nul signifierait l'absence d'arête), ce qui
+    ne change pas l'arbre minimal.
+    Retourne l'arbre sous forme de listes d'adjacence.
+    """
+    decale = poids - poids.min(initial=0) + 1e-9
+    mst = minimum_spanning_tree(coo_matrix((decale, (lignes, colonnes)), shape=(n, n))).tocoo()
+    arbre_couvr_min = [[] for _ in range(n)]
+    for i, j in zip(mst.row.tolist(), mst.col.tolist()):
+        arbre_couvr_min[i].append(j)
+        arbre_couvr_min[j].append(i)
+    return arbre_couvr_min
+
+
+def graphe_octants(coords):
+    """
+    Graphe qui contient un arbre couvrant minimal pour la distance de
+    Manhattan: chaque sommet y est relié à son plus proche voisin dans chacun
+    des 8 octants autour de lui (au plus 4n arêtes). Les plus proches voisins
+    sont obtenus par un balayage des sommets par x + y croissant, pour 4
+    symétries des coordonnées qui ramènent chaque octant au même cas; la liste
+    triée des sommets en attente de leur voisin est tenue par bisect.
+    Retourne les arêtes sous forme de trois arrays (lignes, colonnes, poids).
+    """
+    points = np.asarray([coords[i] for i in range(len(coords))], dtype=np.int64).reshape(-1, 2)
+    X, Y = points[:, 0].copy(), points[:, 1].copy()
+    lignes, colonnes = [], []
+    for k in range(4):
+        xs, ys = X.tolist(), Y.tolist()
+        # Sommets en attente, triés par -y (cles) avec leur indice (sommets)
+        cles, sommets = [], []
+        for i in np.argsort(X + Y, kind="stable").tolist():
+            cle = -ys[i]
+            a = b = bisect.bisect_left(cles, cle)
+            while b < len(cles):
+                j = sommets[b]
+                if ys[i] - ys[j] > xs[i] - xs[j]:
+                    break
+                # i est le plus proche voisin de j dans l'octant balayé
+                lignes.append(i)
+                colonnes.append(j)
+                b += 1
+            del cles[a:b], sommets[a:b]
+            if a < len(cles) and cles[a] == cle:
+                sommets[a] = i
+            else:
+                cles.insert(a, cle)
+                sommets.insert(a, i)
+        if k % 2:
+            X = -X
+        else:
+            X, Y = Y, X
+    # Une même arête peut être trouvée par deux balayages: coo_matrix
+    # additionnerait ses poids, on ne la garde qu'une fois
+    aretes = np.unique(np.sort(np.array([lignes, colonnes], dtype=np.intp).reshape(2, -1), axis=0), axis=1)
+    lignes, colonnes = aretes[0], aretes[1]
+    poids = np.abs(points[lignes] - points[colonnes]).sum(axis=1).astype(np.float64)
+    return lignes, colonnes, poids
+
+
+def arbre_couvrant_geometrique(coords):
+    """
+    Arbre couvrant minimal (distance de Manhattan) calculé à partir des seules
+    coordonnées: arbre couvrant minimal du graphe des octants (voir
+    graphe_octants), qui contient un arbre couvrant minimal du graphe complet.
+    Coût en O(n log n) (hors tenue de la liste triée), sans matrice.
+    Retourne l'arbre sous forme de listes d'adjacence.
+    """
+    n = len(coords)
+    if n < 2:
+        return [[] for _ in range(n)]
+    return arbre_couvrant_graphe(n, *graphe_octants(coords))
+
+
+def parcours_profondeur(arbre_couvr_min, racine=0):
+    """
+    Parcours en profondeur (ordre préfixe) itératif avec une pile explicite:
+    pas de limite de récursion sur les longues chaînes.
+    """
+    n = len(arbre_couvr_min)
+    vu = [False] * n
+    visited = []
+    pile = [racine]
+    while pile:
+        u = pile.pop()
+        if vu[u]:
+            continue
+        vu[u] = True
+        visited.append(u)
+        # Empilés à l'envers pour être visités dans l'ordre des listes
+        for v in reversed(arbre_couvr_min[u]):
+            if not vu[v]:
+                pile.append(v)
+    return visited
+
+
+def arbre_couvrant(coords, dist=None):
+    """
+    Arbre couvrant minimal de l'instance: Prim sur la matrice des distances si
+    elle est disponible, MST géométrique à partir des coordonnées sinon.
+    """
+    if dist is None:
+        return arbre_couvrant_geometrique(coords)
+    if hasattr(dist, "D"):
+        return arbre_couvrant_prim(dist.D)
+    if hasattr(dist, "coords"):
+        # Sans matrice (LazyInstance): MST géométrique, en mémoire O(n)
+        return arbre_couvrant_geometrique(dist.coords)
+    noeud = range(len(coords))  # ex. 0..n
+    M = np.array([[dist[(i, j)] for j in noeud] for i in noeud])
+    return arbre_couvrant_prim(M)
+
+
+def solve_tsp_2approx(coords, dist=None):
     """
     Algorithme 2-approx:
-      1) Construire un MST (ici version Kruskal)
+      1) Construire un MST (Prim sur la matrice des distances, ou MST
+         géométrique à partir des seules coordonnées si dist vaut None)
       2) Effectuer un DFS depuis la racine (0) pour lister les sommets
       3) Fermer le circuit en revenant à 0
     """
-    noeud  = list(coords.keys())  # ex. 0..n
-    # Création d'une liste d'arêtes (poids, i, j)
-    aretes = []
-    for i in noeud :
-        for j in noeud :
-            if i < j:
-                aretes.append((dist[(i,j)], i, j))
-                
-                
-    # Tri des arêtes par poids
-    aretes.sort(key=lambda e: e[0])
-    
-    # Structure pour l'union-find 
-    parent = {v: v for v in noeud }
-    rang = {v: 0 for v in noeud }
-    
-
-    def find(v):
-        """
-        Trouve le représentant (chef) de la composante de v.
-        Si parent[v] != v, on met à jour parent[v] pour compresser le chemin.
-        """
-        
-        if parent[v] != v:
-            parent[v] = find(parent[v])
-        return parent[v]
-    
-    def union(a, b):
-        """
-        Fusionne les composantes de a et de b si elles sont distinctes.
-        On utilise le rang pour attacher l'arbre le plus petit sous le plus grand.
-        """
-        
-        parentA = find(a)
-        parentB = find(b)
-        if parentA != parentB:
-            if rang[parentA] < rang[parentB]:
-                parent[parentA] = parentB
-            elif rang[parentA] > rang[parentB]:
-                parent[parentB] = parentA
-            else:
-                parent[parentB] = parentA
-                rang[parentA] += 1
-    
-    # Construit l'arbre couvrant minimal sous forme d'une liste d'adjacence
-    arbre_couvr_min = {v: [] for v in noeud }
-    for w, i, j in aretes:
-        # Si i et j ne sont pas déjà connectés (ce qui éviterait une boucle), alors on peut les relier.
-        if find(i) != find(j):
-            union(i, j)
-            arbre_couvr_min[i].append(j)
-            arbre_couvr_min[j].append(i)
-    
+    arbre_couvr_min = arbre_couvrant(coords, dist)
+
     # DFS pour créer un ordre de visite
-    visited = []
-    def dfs(u):
-        visited.append(u)
-        for v in arbre_couvr_min[u]:
-            if v not in visited:
-                dfs(v)
-                
-    dfs(0)  # part du centre (0)
-    
+    visited = parcours_profondeur(arbre_couvr_min, 0)  # part du centre (0)
+
     # On "ferme" le cycle en revenant au centre
     visited.append(0)
-    
+
     return visited
 
+
+def appariement_exact(M):
+    """
+    Couplage parfait de poids minimal entre les k sommets (k pair) de la
+    matrice de distances M, par programmation dynamique sur les sous-ensembles:
+    f(S) = min sur j dans S de M[i][j] + f(S \\ {i, j}) où i est le plus petit
+    sommet de S. Les masques sont traités couche par couche (cardinal pair) de
+    façon vectorisée. Complexité O(k 2^k): réservé aux petits ensembles.
+    Retourne la liste des paires (indices locaux).
+    """
+    M = np.asarray(M, dtype=np.float64)
+    k = len(M)
+    f = np.full(1 << k, np.inf)
+    f[0] = 0
+    choix = np.zeros(1 << k, dtype=np.int8)
+    couches = layers_by_size(k)
+    for c in range(2, k + 1, 2):
+        S = couches[c]
+        i = np.log2(S & -S).astype(np.int64)   # plus petit sommet de S
+        meilleur = np.full(len(S), np.inf)
+        meilleur_j = np.zeros(len(S), dtype=np.int8)
+        for j in range(1, k):
+            idx = np.nonzero(((S >> j) & 1 == 1) & (i != j))[0]
+            if len(idx) == 0:
+                continue
+            cand = f[S[idx] ^ (1 << i[idx]) ^ (1 << j)] + M[i[idx], j]
+            mieux = cand < meilleur[idx]
+            meilleur[idx[mieux]] = cand[mieux]
+            meilleur_j[idx[mieux]] = j
+        f[S] = meilleur
+        choix[S] = meilleur_j
+
+    paires = []
+    S = (1 << k) - 1
+    while S:
+        i = (S & -S).bit_length() - 1
+        j = int(choix[S])
+        paires.append((i, j))
+        S ^= (1 << i) | (1 << j)
+    return paires
+
+
+def appariement_glouton(points, k=10):
+    """
+    Couplage parfait glouton entre des points (array k x 2): les paires
+    candidates sont les k plus proches voisins (distance de Manhattan, k-d
+    tree) et sont retenues par distance croissante si leurs deux sommets sont
+    libres. L'opération est répétée sur les sommets restés seuls.
+    Retourne la liste des paires (indices locaux).
+    """
+    points = np.asarray(points, dtype=np.float64)
+    restants = np.arange(len(points))
+    paires = []
+    while len(restants) > 2:
+        kk = min(k, len(restants) - 1)
+        dist_k, idx = cKDTree(points[restants]).query(points[restants], k=kk + 1, p=1)
+        ordre = np.argsort(dist_k[:, 1:], axis=None, kind="stable")
+        libre = np.ones(len(restants), dtype=bool)
+        for a, t in zip(*np.unravel_index(ordre, (len(restants), kk))):
+            b = idx[a, t + 1]
+            if a != b and libre[a] and libre[b]:
+                libre[a] = libre[b] = False
+                paires.append((restants[a], restants[b]))
+        restants = restants[libre]
+    if len(restants) == 2:
+        paires.append((restants[0], restants[1]))
+    return [(int(a), int(b)) for a, b in paires]
+
+
+def circuit_eulerien(adjacence, depart=0):
+    """
+    Algorithme de Hierholzer itératif sur un multigraphe connexe dont tous les
+    sommets sont de degré pair: adjacence[u] est la liste des couples
+    (v, numéro de l'arête). Retourne la suite des sommets du circuit.
+    """
+    nb_aretes = sum(len(a) for a in adjacence) // 2
+    utilisee = [False] * nb_aretes
+    suivant = [0] * len(adjacence)
+    pile = [depart]
+    circuit = []
+    while pile:
+        u = pile[-1]
+        voisins = adjacence[u]
+        while suivant[u] < len(voisins) and utilisee[voisins[suivant[u]][1]]:
+            suivant[u] += 1
+        if suivant[u] == len(voisins):
+            circuit.append(pile.pop())
+        else:
+            v, e = voisins[suivant[u]]
+            utilisee[e] = True
+            pile.append(v)
+    circuit.reverse()
+    return circuit
+
+
+def solve_tsp_christofides(coords, dist=None, glouton=None, seuil_exact=18):
+    """
+    Algorithme de Christofides (facteur 1.5 avec un couplage exact):
+      1) Construire le MST (comme pour le 2-approx)
+      2) Coupler les sommets de degré impair: couplage parfait de poids minimal
+         exact (appariement_exact) ou glouton (appariement_glouton). Par défaut
+         (glouton=None), le couplage glouton n'est utilisé que s'il y a plus
+         de seuil_exact sommets impairs.
+      3) Parcourir un circuit eulérien de MST + couplage en sautant les
+         sommets déjà visités, depuis le centre (0)
+    """
+    arbre_couvr_min = arbre_couvrant(coords, dist)
+    n = len(arbre_couvr_min)
+    impairs = [v for v in range(n) if len(arbre_couvr_min[v]) % 2 == 1]
+    if glouton is None:
+        glouton = len(impairs) > seuil_exact
+    if glouton:
+        points = np.asarray([coords[v] for v in impairs])
+        paires = appariement_glouton(points)
+    elif dist is None:
+        paires = appariement_exact(manhattan_matrix([coords[v] for v in impairs]))
+    else:
+        paires = appariement_exact(sous_matrice(impairs, dist))
+
+    # Multigraphe MST + couplage, chaque arête ayant un numéro
+    adjacence = [[] for _ in range(n)]
+    aretes = [(u, v) for u in range(n) for v in arbre_couvr_min[u] if u < v]
+    aretes += [(impairs[a], impairs[b]) for a, b in paires]
+    for e, (u, v) in enumerate(aretes):
+        adjacence[u].append((v, e))
+        adjacence[v].append((u, e))
+
+    # Raccourcis: on ne garde que la première visite de chaque sommet
+    vu = [False] * n
+    visited = []
+    for v in circuit_eulerien(adjacence, 0):
+        if not vu[v]:
+            vu[v] = True
+            visited.append(v)
+    visited.append(0)
+
+    return visited
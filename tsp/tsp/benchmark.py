@@ -0,0 +1,194 @@
+import argparse
+import csv
+import json
+import statistics
+import time
+import tracemalloc
+from utils import generate_dense_instance, generate_lazy_instance, check_solution, evaluate_solution
+from construct import CONSTRUCTIONS
+from approx import solve_tsp_2approx, solve_tsp_christofides
+from rech_loc import recherche_locale, listes_voisins, SEUIL_MATRICE
+from lk import lin_kernighan
+from progdyn import tspPrDy
+from ilp import tsp_ilp_solver
+from branch_bound import tsp_branch_bound
+from solve import solve
+
+##Banc d'essai des méthodes du package
+
+#Chaque méthode est exécutée sur une grille de tailles n (nombre de clients),
+#pour plusieurs instances générées avec des graines fixées. On mesure le temps
+#d'exécution, le pic de mémoire (tracemalloc, lors d'une exécution séparée
+#pour ne pas fausser le temps), le coût de la tournée et l'écart à la meilleure
+#tournée connue pour la même instance (optimum de la programmation dynamique
+#ou meilleur coût obtenu par l'ensemble des méthodes). Les résultats sont
+#écrits en JSON ou CSV et peuvent être comparés à une référence enregistrée.
+#Au-delà de SEUIL_MATRICE clients, les instances n'ont pas de matrice des
+#distances (LazyInstance, mémoire en O(n)) et seules les méthodes qui
+#travaillent sur les coordonnées (constructions, recherche locale sur les
+#listes de voisins, 2-approx sur le MST géométrique) vont jusqu'à 100000.
+
+
+def _rech_loc(instance):
+    tour = CONSTRUCTIONS["ppv"](instance.coords)
+    return recherche_locale(tour, instance, listes_voisins(instance.coords, 10), ("2opt", "oropt"))
+
+
+#nom -> (fonction instance -> tournée, plus grand n traité)
+METHODES = {
+    "2approx": (lambda inst: solve_tsp_2approx(inst.coords, inst), 100000),
+    "christofides": (lambda inst: solve_tsp_christofides(inst.coords, inst), 20000),
+    "ppv": (lambda inst: CONSTRUCTIONS["ppv"](inst.coords), 100000),
+    "glouton": (lambda inst: CONSTRUCTIONS["glouton"](inst.coords), 100000),
+    "hilbert": (lambda inst: CONSTRUCTIONS["hilbert"](inst.coords), 100000),
+    "rech_loc": (_rech_loc, 100000),
+    "lk": (lambda inst: lin_kernighan(CONSTRUCTIONS["ppv"](inst.coords), inst), 10000),
+    "progdyn": (lambda inst: tspPrDy(inst, 0)[1], 20),
+    "ilp": (lambda inst: tsp_ilp_solver(0, inst, mode="dfj")[1], 20),
+    "branch_bound": (lambda inst: tsp_branch_bound(0, inst)[1], 40),
+    "solve": (lambda inst: solve(inst, "auto", time_budget=10)[1], 20000),
+}
+
+TAILLES = (10, 20, 100, 1000, 10000, 100000)
+
+
+def instance_banc(n, graine):
+    """Instance de n clients: dense jusqu'à SEUIL_MATRICE clients, sans
+    matrice des distances (LazyInstance) au-delà."""
+    if n > SEUIL_MATRICE:
+        return generate_lazy_instance(n, seed=graine)
+    return generate_dense_instance(n, seed=graine)
+
+
+def mesurer(f, instance, memoire=False):
+    """
+    Exécute f(instance) et retourne la tournée, le temps (en secondes) et, si
+    memoire est vrai, le pic de mémoire allouée (en octets) mesuré par
+    tracemalloc (None sinon).
+    """
+    if memoire:
+        tracemalloc.start()
+    debut = time.perf_counter()
+    tour = f(instance)
+    temps = time.perf_counter() - debut
+    pic = None
+    if memoire:
+        pic = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return tour, temps, pic
+
+
+def executer(methodes=None, tailles=TAILLES, repetitions=3, graine=0, memoire=True):
+    """
+    Exécute le banc d'essai et retourne la liste des résultats (un dictionnaire
+    par méthode, taille et répétition). La répétition r utilise l'instance de
+    graine graine + r, identique pour toutes les méthodes.
+    """
+    methodes = list(METHODES) if methodes is None else methodes
+    resultats = []
+    for n in tailles:
+        for r in range(repetitions):
+            instance = instance_banc(n, graine + r)
+            lignes = []
+            for nom in methodes:
+                f, n_max = METHODES[nom]
+                if n > n_max:
+                    continue
+                tour, temps, _ = mesurer(f, instance)
+                pic = mesurer(f, instance, memoire=True)[2] if memoire and r == 0 else None
+                lignes.append({"methode": nom, "n": n, "graine": graine + r, "temps": temps,
+                               "memoire_max": pic, "cout": int(evaluate_solution(tour, instance)),
+                               "valide": check_solution(tour, n)})
+                print(f"{nom:<14} n={n:<7} graine={graine + r:<4} temps={temps:.4f}s coût={lignes[-1]['cout']}")
+            # Écart à la meilleure tournée connue pour cette instance
+            meilleur = min(l["cout"] for l in lignes if l["valide"])
+            for l in lignes:
+                l["ecart"] = (l["cout"] - meilleur) / meilleur * 100 if meilleur > 0 else 0.0
+            resultats += lignes
+    return resultats
+
+
+def resumer(resultats):
+    """Temps médian, coût moyen et écart moyen par couple (méthode, n)."""
+    groupes = {}
+    for l in resultats:
+        groupes.setdefault((l["methode"], l["n"]), []).append(l)
+    resume = []
+    for (nom, n), lignes in groupes.items():
+        pics = [l["memoire_max"] for l in lignes if l["memoire_max"] is not None]
+        resume.append({"methode": nom, "n": n,
+                       "temps_median": statistics.median(l["temps"] for l in lignes),
+                       "memoire_max": max(pics) if pics else None,
+                       "cout_moyen": statistics.mean(l["cout"] for l in lignes),
+                       "ecart_moyen": statistics.mean(l["ecart"] for l in lignes)})
+    return resume
+
+
+def comparer(resume, reference, seuil=0.2, temps_min=0.01):
+    """
+    Compare les temps médians à ceux de la référence (résumé d'une exécution
+    précédente) et retourne la liste des ralentissements de plus de seuil
+    (20% par défaut), en ignorant les temps inférieurs à temps_min secondes.
+    """
+    ref = {(l["methode"], l["n"]): l["temps_median"] for l in reference}
+    ralentissements = []
+    for l in resume:
+        t_ref = ref.get((l["methode"], l["n"]))
+        if t_ref is None or max(t_ref, l["temps_median"]) < temps_min:
+            continue
+        if l["temps_median"] > t_ref * (1 + seuil):
+            ralentissements.append(dict(l, temps_reference=t_ref,
+                                        ralentissement=l["temps_median"] / t_ref - 1))
+    return ralentissements
+
+
+def ecrire_csv(resultats, chemin):
+    champs = ["methode", "n", "graine", "temps", "memoire_max", "cout", "ecart", "valide"]
+    with open(chemin, "w", newline="") as f:
+        ecrivain = csv.DictWriter(f, fieldnames=champs)
+        ecrivain.writeheader()
+        ecrivain.writerows(resultats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai des méthodes de résolution du TSP")
+    parser.add_argument("--methodes", nargs="+", choices=list(METHODES), default=None)
+    parser.add_argument("--tailles", nargs="+", type=int, default=list(TAILLES))
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--sans-memoire", action="store_true", help="ne pas mesurer le pic de mémoire")
+    parser.add_argument("--json", help="fichier JSON des résultats (réutilisable comme référence)")
+    parser.add_argument("--csv", help="fichier CSV des résultats")
+    parser.add_argument("--reference", help="fichier JSON d'une exécution précédente")
+    parser.add_argument("--seuil", type=float, default=0.2, help="ralentissement toléré (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    resultats = executer(args.methodes, args.tailles, args.repetitions, args.graine, not args.sans_memoire)
+    resume = resumer(resultats)
+
+    print(f"\n{'Méthode':<14} | {'n':<7} | {'Temps médian (s)':<16} | {'Mémoire (Mo)':<12} | {'Écart moyen':<11}")
+    print("-" * 72)
+    for l in resume:
+        memoire = f"{l['memoire_max'] / 2**20:.1f}" if l["memoire_max"] is not None else "N/A"
+        print(f"{l['methode']:<14} | {l['n']:<7} | {l['temps_median']:<16.4f} | {memoire:<12} | {l['ecart_moyen']:<10.2f}%")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"resultats": resultats, "resume": resume}, f, indent=1)
+    if args.csv:
+        ecrire_csv(resultats, args.csv)
+
+    if args.reference:
+        with open(args.reference) as f:
+            reference = json.load(f)["resume"]
+        ralentissements = comparer(resume, reference, args.seuil)
+        print(f"\n{len(ralentissements)} ralentissement(s) par rapport à {args.reference}")
+        for l in ralentissements:
+            print(f"  RALENTISSEMENT {l['methode']} n={l['n']}: {l['temps_reference']:.4f}s -> "
+                  f"{l['temps_median']:.4f}s (+{l['ralentissement'] * 100:.0f}%)")
+        if ralentissements:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
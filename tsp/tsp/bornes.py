@@ -0,0 +1,159 @@
+import math
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree
+from utils import LazyInstance, evaluate_solution, manhattan_matrix
+from approx import arbre_couvrant_prim, graphe_voisins, solve_tsp_2approx
+from instrumentation import compter
+
+##Borne inférieure de Held-Karp (1-arbres et optimisation par sous-gradient)
+
+#Un 1-arbre est un arbre couvrant des sommets autres que le dépôt 0, auquel on
+#ajoute les deux arêtes les plus courtes partant du dépôt. Une tournée est un
+#1-arbre dont tous les sommets sont de degré 2: le poids du 1-arbre minimal
+#est donc une borne inférieure du coût optimal. On l'améliore avec des
+#pénalités pi sur les sommets: avec les poids d(i,j) + pi[i] + pi[j], le coût
+#de toute tournée augmente de exactement 2 sum(pi), donc
+#   L(pi) = poids du 1-arbre minimal pour les poids pénalisés - 2 sum(pi)
+#est encore une borne inférieure. On maximise L par sous-gradient: les sommets
+#de degré supérieur à 2 sont pénalisés, ceux de degré 1 favorisés
+#(pi += t (degre - 2)), avec le pas t = lambda (UB - L) / ||degre - 2||² où UB
+#est le coût d'une tournée connue.
+#Pendant l'ascension, l'arbre couvrant est calculé sur le graphe des k plus
+#proches voisins (coût proche de celui d'un arbre couvrant minimal), dont la
+#matrice creuse est construite une seule fois: seuls les poids pénalisés
+#changent d'une itération à l'autre. Ce graphe ne contient pas toutes les
+#arêtes et peut surestimer L: la borne finale est donc recalculée, pour les
+#meilleures pénalités, avec l'algorithme de Prim sur le graphe complet (O(n²)
+#en temps mais O(n) en mémoire sans matrice).
+
+#Jusqu'à ce nombre de sommets, les 1-arbres de l'ascension sont calculés par
+#Prim sur la matrice complète (plus rapide que la matrice creuse pour les
+#petites tournées): chaque borne est alors exacte et n'est pas recalculée
+SEUIL_DENSE = 20
+
+#Au-delà de ce nombre de sommets, la borne n'est pas recalculée sur le graphe
+#complet (environ 0,5 s pour 5000 sommets, mais 8 s pour 20000) et n'est pas
+#certifiée
+SEUIL_CERTIFICATION = 5000
+
+
+def un_arbre(distances_depot, degres_arbre, poids_aretes, penalites):
+    """
+    Complète un arbre couvrant des sommets autres que le dépôt, de degrés
+    'degres_arbre' et de poids pénalisé total 'poids_aretes', des deux arêtes
+    pénalisées les plus courtes partant du dépôt 0. 'distances_depot' est
+    l'array des distances du dépôt à tous les sommets.
+    Retourne le couple (L(pi), degrés des sommets dans le 1-arbre).
+    """
+    aretes_depot = distances_depot + penalites + penalites[0]
+    aretes_depot[0] = np.inf
+    a, b = np.argpartition(aretes_depot, 1)[:2]
+    degres = np.array(degres_arbre)
+    degres[[a, b]] += 1
+    degres[0] = 2
+    poids = poids_aretes + aretes_depot[a] + aretes_depot[b]
+    return poids - 2 * penalites.sum(), degres
+
+
+def _arbre_voisins(G, ordre, poids_penalises):
+    """
+    Arbre couvrant minimal du graphe des voisins G (matrice creuse CSR dont
+    la donnée d'indice q correspond à l'arête ordre[q]) pour les poids
+    pénalisés. Les poids sont décalés pour être strictement positifs (un poids
+    nul signifierait l'absence d'arête), ce qui ne change pas l'arbre minimal.
+    Retourne le couple (degrés des sommets, poids pénalisé total de l'arbre).
+    """
+    decalage = poids_penalises.min() - 1e-9
+    G.data = poids_penalises[ordre] - decalage
+    arbre = minimum_spanning_tree(G).tocoo()
+    n = G.shape[0]
+    degres = np.bincount(arbre.row, minlength=n) + np.bincount(arbre.col, minlength=n)
+    return degres, float(arbre.data.sum() + len(arbre.data) * decalage)
+
+
+def _poids_arbre(arbre, coords, penalites):
+    """Poids pénalisé d'un arbre (listes d'adjacence) pour la distance de Manhattan."""
+    i = np.array([u for u in range(len(arbre)) for v in arbre[u] if u < v], dtype=np.intp)
+    j = np.array([v for u in range(len(arbre)) for v in arbre[u] if u < v], dtype=np.intp)
+    return float(np.abs(coords[i] - coords[j]).sum() + penalites[i].sum() + penalites[j].sum())
+
+
+def borne_held_karp(coords, dist=None, cout_tour=None, iterations=50, k=10):
+    """
+    Borne inférieure de Held-Karp du coût d'une tournée optimale sur les
+    sommets de coords (distance de Manhattan, dépôt 0), obtenue par
+    'iterations' pas de sous-gradient sur les 1-arbres du graphe des k plus
+    proches voisins (du graphe complet jusqu'à SEUIL_DENSE sommets).
+    cout_tour est le coût d'une tournée connue (par défaut, celui du
+    2-approx), qui fixe la longueur des pas. Si dist est une
+    Instance, sa matrice sert au calcul final sur le graphe complet.
+    Retourne le couple (borne, certifiee): la borne est arrondie à l'entier
+    supérieur (distances entières) et certifiee indique qu'elle a été calculée
+    sur le graphe complet (jusqu'à SEUIL_CERTIFICATION sommets).
+    """
+    C = np.asarray([coords[i] for i in range(len(coords))], dtype=np.int64).reshape(-1, 2)
+    n = len(C)
+    if n < 3:
+        return (2 * int(np.abs(C[1] - C[0]).sum()) if n == 2 else 0), True
+    if not hasattr(dist, "D"):
+        # Lignes de distances calculées à la demande pour le graphe complet
+        dist = LazyInstance(C)
+    if cout_tour is None:
+        cout_tour = evaluate_solution(solve_tsp_2approx(C), dist)
+    distances_depot = np.abs(C - C[0]).sum(axis=1).astype(np.float64)
+    if n <= SEUIL_DENSE:
+        M = manhattan_matrix(C)
+
+        def arbre_minimal(penalites):
+            arbre = arbre_couvrant_prim(M, penalites, sans=0)
+            return [len(voisins) for voisins in arbre], _poids_arbre(arbre, C, penalites)
+    else:
+        lignes, colonnes, poids = graphe_voisins(C, k, np.arange(1, n))
+        # Matrice creuse du graphe construite une seule fois; ordre[q] est
+        # l'arête de la donnée d'indice q
+        G = csr_matrix((np.arange(1, len(poids) + 1, dtype=np.float64), (lignes, colonnes)), shape=(n, n))
+        ordre = G.data.astype(np.intp) - 1
+
+        def arbre_minimal(penalites):
+            return _arbre_voisins(G, ordre, poids + penalites[lignes] + penalites[colonnes])
+
+    penalites = np.zeros(n)
+    meilleure, meilleures_penalites = -np.inf, penalites.copy()
+    pas_lambda = 2.0
+    sans_progres = 0
+    effectuees = 0
+    for _ in range(iterations):
+        effectuees += 1
+        degres_arbre, poids_arbre = arbre_minimal(penalites)
+        L, degres = un_arbre(distances_depot, degres_arbre, poids_arbre, penalites)
+        if L > meilleure + 1e-9:
+            meilleure, meilleures_penalites = L, penalites.copy()
+            sans_progres = 0
+        else:
+            sans_progres += 1
+            if sans_progres >= 5:
+                # Pas trop grand: on le divise par deux
+                pas_lambda /= 2
+                sans_progres = 0
+        g = degres - 2
+        norme = float((g * g).sum())
+        if norme == 0:
+            # Le 1-arbre est une tournée: elle est optimale
+            break
+        penalites = penalites + pas_lambda * max(cout_tour - L, 0) / norme * g
+
+    certifiee = n <= SEUIL_CERTIFICATION
+    if SEUIL_DENSE < n <= SEUIL_CERTIFICATION:
+        arbre = arbre_couvrant_prim(dist, meilleures_penalites, sans=0)
+        meilleure, _ = un_arbre(distances_depot, [len(voisins) for voisins in arbre],
+                                _poids_arbre(arbre, C, meilleures_penalites), meilleures_penalites)
+    compter("bornes", appels=1, iterations=effectuees)
+    # Distances entières: le coût optimal est au moins l'entier supérieur
+    return math.ceil(meilleure - 1e-6), certifiee
+
+
+def ecart_certifie(cout, borne):
+    """Écart (en %) du coût d'une tournée à la borne inférieure: l'écart à
+    l'optimum est au plus cette valeur."""
+    return (cout - borne) / borne * 100 if borne > 0 else 0.0
@@ -0,0 +1,347 @@
+import heapq
+import math
+import time
+import numpy as np
+from utils import distance_matrix, evaluate_solution
+from rech_loc import deux_opt, normaliser_tournee
+from construct import tournee_initiale
+from lk import lin_kernighan
+from approx import parcours_profondeur
+from instrumentation import compter
+
+##Séparation et évaluation (branch-and-bound) avec bornes des 1-arbres
+
+#Entre la programmation dynamique (limitée à une vingtaine de sommets par la
+#mémoire) et l'ILP, on résout exactement les instances de 15 à 40 sommets par
+#séparation et évaluation:
+#   - évaluation: borne de Held-Karp (voir bornes.py), 1-arbre minimal pour des
+#     distances pénalisées d(i,j) + pi[i] + pi[j], les pénalités étant
+#     optimisées par sous-gradient; chaque nœud repart des pénalités de son
+#     père, ce qui suffit à quelques itérations. Si le 1-arbre est une
+#     tournée, elle est optimale dans le nœud;
+#   - séparation: on choisit une arête libre du 1-arbre en un sommet de degré
+#     supérieur à 2; elle est interdite dans un fils et imposée dans l'autre.
+#     Un sommet qui a deux arêtes imposées perd ses autres arêtes, et l'arête
+#     qui fermerait prématurément une chaîne d'arêtes imposées est interdite;
+#   - exploration: meilleur d'abord (file de priorité sur la borne) tant que la
+#     file compte moins de max_file nœuds, en profondeur d'abord au-delà, ce qui
+#     borne la mémoire;
+#   - tournée initiale: construction gloutonne (ou tournée fournie) améliorée
+#     par Lin-Kernighan, dont le coût élimine d'emblée la plupart des nœuds;
+#   - borne supérieure: le 1-arbre de chaque nœud séparé est réparé en tournée
+#     (parcours en profondeur puis 2-opt), ce qui améliore la meilleure tournée
+#     en cours de recherche lorsque la tournée initiale n'est pas optimale.
+#Le 1-arbre est calculé par Prim (O(n²) vectorisé) sur une matrice où les
+#arêtes imposées valent -IMPOSEE et les arêtes interdites l'infini.
+
+#Nombre de sommets jusqu'auquel la méthode est conçue (au-delà, le nombre de
+#nœuds peut croître fortement)
+TAILLE_MAX = 40
+
+IMPOSEE = 1e12
+LIBRE, INTERDITE, IMPOSEE_ETAT = 0, -1, 1
+
+
+class Noeud:
+    """Nœud de l'arbre de recherche: état des arêtes (LIBRE, INTERDITE ou
+    IMPOSEE_ETAT) et pénalités de départ du sous-gradient."""
+
+    __slots__ = ("etat", "penalites", "borne", "meilleur")
+
+    def __init__(self, etat, penalites, borne=-math.inf):
+        self.etat = etat
+        self.penalites = penalites
+        self.borne = borne
+        self.meilleur = None   # (arêtes, degrés) du meilleur 1-arbre
+
+
+def _entier(borne, entiers=True):
+    """Distances entières: le coût optimal est au moins l'entier supérieur à
+    la borne. Sinon, la borne est retournée telle quelle."""
+    return borne if math.isinf(borne) or not entiers else math.ceil(borne - 1e-6)
+
+
+def _elague(borne, borne_sup, entiers=True):
+    """Vrai si un nœud de borne inférieure 'borne' ne peut pas contenir de
+    tournée de coût inférieur à borne_sup (à l'erreur d'arrondi près pour des
+    distances non entières)."""
+    if entiers:
+        return _entier(borne) >= borne_sup
+    return borne >= borne_sup - 1e-9 * abs(borne_sup)
+
+
+def un_arbre_contraint(W, etat):
+    """
+    1-arbre minimal pour la matrice de poids W (sommet spécial 0) respectant
+    l'état des arêtes. Retourne le couple (poids, arêtes) où arêtes est la
+    liste des couples (i, j), ou None si les arêtes interdites déconnectent
+    le graphe.
+    """
+    n = len(W)
+    P = np.where(etat == INTERDITE, np.inf, np.where(etat == IMPOSEE_ETAT, -IMPOSEE, W))
+    # Prim sur les sommets 1..n-1
+    dans_arbre = np.zeros(n, dtype=bool)
+    dans_arbre[:2] = True
+    cle = P[1].copy()
+    parent = np.ones(n, dtype=np.intp)
+    cle[:2] = np.inf
+    aretes = []
+    for _ in range(n - 2):
+        u = int(np.argmin(cle))
+        if cle[u] == np.inf:
+            return None
+        aretes.append((int(parent[u]), u))
+        dans_arbre[u] = True
+        cle[u] = np.inf
+        maj = (P[u] < cle) & ~dans_arbre
+        cle[maj] = P[u][maj]
+        parent[maj] = u
+    # Deux arêtes du sommet spécial 0 (les arêtes imposées d'abord)
+    ligne = P[0].copy()
+    ligne[0] = np.inf
+    a, b = np.argpartition(ligne, 1)[:2]
+    if ligne[b] == np.inf:
+        return None
+    aretes += [(0, int(a)), (0, int(b))]
+    i, j = np.array(aretes).T
+    return float(W[i, j].sum()), aretes
+
+
+def evaluer(M, noeud, borne_sup, iterations, entiers=True):
+    """
+    Optimise par sous-gradient les pénalités du nœud (à partir de celles de
+    son père) et met à jour sa borne, qui reste au moins celle du père.
+    Retourne la tournée (liste de sommets fermée, partant de 0) si un 1-arbre
+    minimal est une tournée: elle est alors optimale dans le nœud. Sinon,
+    retourne None; noeud.borne vaut l'infini si le nœud est infaisable.
+    entiers indique si les distances sont entières (voir _elague).
+    """
+    n = len(M)
+    penalites = noeud.penalites
+    pas_lambda = 2.0
+    sans_progres = 0
+    meilleure = -math.inf
+    for _ in range(iterations):
+        W = M + penalites[:, None] + penalites[None, :]
+        resultat = un_arbre_contraint(W, noeud.etat)
+        if resultat is None:
+            noeud.borne = math.inf
+            return None
+        poids, aretes = resultat
+        L = poids - 2 * penalites.sum()
+        degres = np.bincount(np.array(aretes).ravel(), minlength=n)
+        g = degres - 2
+        norme = float((g * g).sum())
+        if norme == 0:
+            noeud.borne = L
+            return aretes_vers_tournee(aretes, n)
+        if L > meilleure + 1e-9:
+            meilleure = L
+            noeud.penalites, noeud.meilleur = penalites, (aretes, degres)
+            sans_progres = 0
+        else:
+            sans_progres += 1
+            if sans_progres >= 3:
+                pas_lambda /= 2
+                sans_progres = 0
+        if _elague(max(noeud.borne, meilleure), borne_sup, entiers):
+            break
+        # Écart minimal à la borne supérieure (pas non nul): une unité pour des
+        # distances entières, relatif au coût sinon
+        ecart = max(borne_sup - L, 1.0 if entiers else 1e-3 * borne_sup)
+        penalites = penalites + pas_lambda * ecart / norme * g
+    noeud.borne = max(noeud.borne, meilleure)
+    return None
+
+
+def reparer(aretes, d):
+    """
+    Tournée (partant de 0 et s'y terminant) obtenue à partir d'un 1-arbre:
+    ordre préfixe d'un parcours en profondeur depuis 0, amélioré par 2-opt
+    avec la matrice d (liste de listes).
+    """
+    voisins = [[] for _ in range(len(d))]
+    for i, j in aretes:
+        voisins[i].append(j)
+        voisins[j].append(i)
+    tour = parcours_profondeur(voisins, 0) + [0]
+    deux_opt(tour, d)
+    return tour
+
+
+def aretes_vers_tournee(aretes, n):
+    """Tournée (partant de 0 et s'y terminant) formée par n arêtes de degré 2."""
+    voisins = [[] for _ in range(n)]
+    for i, j in aretes:
+        voisins[i].append(j)
+        voisins[j].append(i)
+    tour = [0, voisins[0][0]]
+    while len(tour) < n:
+        a, b = voisins[tour[-1]]
+        tour.append(a if a != tour[-2] else b)
+    return tour + [0]
+
+
+def _extremite(etat, depart, precedent):
+    """Autre extrémité (et nombre de sommets) de la chaîne d'arêtes imposées
+    partant de 'depart' sans repasser par 'precedent'; si la chaîne revient à
+    'precedent', elle forme un cycle et c'est lui qui est retourné."""
+    arret = precedent
+    longueur = 1
+    while True:
+        suivants = [v for v in np.flatnonzero(etat[depart] == IMPOSEE_ETAT).tolist() if v != precedent]
+        if not suivants:
+            return depart, longueur
+        precedent, depart = depart, suivants[0]
+        longueur += 1
+        if depart == arret:
+            return depart, longueur
+
+
+def imposer(etat, i, j):
+    """
+    Impose l'arête (i, j) dans une copie de l'état et propage: les autres
+    arêtes des sommets de degré imposé 2 sont interdites, ainsi que l'arête
+    qui fermerait la chaîne imposée en un sous-tour. Retourne le nouvel état,
+    ou None si l'arête ne peut pas être imposée.
+    """
+    n = len(etat)
+    etat = etat.copy()
+    etat[i, j] = etat[j, i] = IMPOSEE_ETAT
+    for v in (i, j):
+        imposees = etat[v] == IMPOSEE_ETAT
+        if imposees.sum() > 2:
+            return None
+        if imposees.sum() == 2:
+            libres = etat[v] == LIBRE
+            libres[v] = False
+            etat[v, libres] = etat[libres, v] = INTERDITE
+    a, la = _extremite(etat, i, j)
+    b, lb = _extremite(etat, j, i)
+    if a == j:
+        # La chaîne est un cycle: il doit passer par tous les sommets
+        return etat if la == n else None
+    if la + lb < n and etat[a, b] == LIBRE:
+        etat[a, b] = etat[b, a] = INTERDITE
+    return etat
+
+
+def interdire(etat, i, j):
+    etat = etat.copy()
+    etat[i, j] = etat[j, i] = INTERDITE
+    return etat
+
+
+def separer(noeud):
+    """Fils du nœud: arête libre du 1-arbre en un sommet de degré maximal
+    (supérieur à 2), interdite puis imposée."""
+    aretes, degres = noeud.meilleur
+    v = int(np.argmax(degres))
+    for i, j in aretes:
+        if v in (i, j) and noeud.etat[i, j] == LIBRE:
+            break
+    else:
+        # Toutes les arêtes de v dans le 1-arbre sont imposées: nœud infaisable
+        return []
+    fils = [interdire(noeud.etat, i, j), imposer(noeud.etat, i, j)]
+    return [Noeud(etat, noeud.penalites) for etat in fils if etat is not None]
+
+
+def tsp_branch_bound(origin, distances, initial_tour=None, time_limit=None, details=False,
+                     max_file=100000, iterations_racine=100, iterations=10):
+    """
+    Résout exactement le TSP depuis le sommet 'origin' par séparation et
+    évaluation avec les bornes des 1-arbres (voir l'en-tête du module). Pour
+    des distances entières, les bornes sont arrondies à l'entier supérieur et
+    le coût retourné est entier; sinon, ni les bornes ni le coût ne sont
+    arrondis. La tournée initiale, initial_tour si elle est donnée ou la
+    construction gloutonne sinon (ordre des indices si distances ne donne pas
+    les coordonnées), est améliorée par Lin-Kernighan. La file des nœuds est
+    limitée à max_file nœuds (au-delà, exploration en profondeur d'abord).
+    Si time_limit (en secondes) est atteint, la meilleure tournée trouvée est
+    retournée.
+    Retourne (coût, tournée) comme tsp_ilp_solver et, si details est vrai, un
+    dictionnaire avec le statut, la borne inférieure, l'écart relatif, le
+    nombre de nœuds évalués et le temps de résolution.
+    """
+    debut = time.perf_counter()
+    deadline = None if time_limit is None else time.time() + time_limit
+    M0 = distance_matrix(distances)
+    n = len(M0)
+    # Renumérotation: origin devient le sommet spécial 0 des 1-arbres
+    ordre = [origin] + [v for v in range(n) if v != origin]
+    M = M0[np.ix_(ordre, ordre)].astype(np.float64)
+    rang = {v: r for r, v in enumerate(ordre)}
+
+    if initial_tour is not None:
+        depart = [rang[v] for v in normaliser_tournee(initial_tour, origin)] + [0]
+    elif getattr(distances, "coords", None) is not None:
+        depart = tournee_initiale(list(range(n)), np.asarray(distances.coords)[ordre], "glouton")
+    else:
+        depart = list(range(n)) + [0]
+    meilleure = lin_kernighan(depart, M) if n > 3 else depart
+    borne_sup = evaluate_solution(meilleure, M)
+    # Distances non entières: pas d'arrondi des bornes ni du coût
+    entiers = bool(np.all(M == np.round(M)))
+    d = M.tolist()
+
+    etat = np.zeros((n, n), dtype=np.int8)
+    np.fill_diagonal(etat, INTERDITE)
+    racine = Noeud(etat, np.zeros(n))
+    file = []
+    pile = []
+    compteur = evalues = 0
+    borne_inf = None
+    interrompu = False
+    if n > 3:
+        file.append((-math.inf, 0, racine))
+    while file or pile:
+        if deadline is not None and time.time() >= deadline:
+            interrompu = True
+            break
+        # Profondeur d'abord tant que la pile n'est pas vide (file pleine)
+        noeud = pile.pop() if pile else heapq.heappop(file)[2]
+        if _elague(noeud.borne, borne_sup, entiers):
+            continue
+        tour = evaluer(M, noeud, borne_sup, iterations_racine if evalues == 0 else iterations, entiers)
+        evalues += 1
+        if evalues == 1:
+            borne_inf = noeud.borne
+        if tour is not None:
+            cout = evaluate_solution(tour, M)
+            if cout < borne_sup:
+                meilleure, borne_sup = tour, cout
+            continue
+        if _elague(noeud.borne, borne_sup, entiers):
+            continue
+        tour = reparer(noeud.meilleur[0], d)
+        cout = evaluate_solution(tour, M)
+        if cout < borne_sup:
+            meilleure, borne_sup = tour, cout
+            if _elague(noeud.borne, borne_sup, entiers):
+                continue
+        for fils in separer(noeud):
+            fils.borne = noeud.borne
+            if pile or len(file) >= max_file:
+                pile.append(fils)
+            else:
+                compteur += 1
+                heapq.heappush(file, (fils.borne, compteur, fils))
+    compter("branch_bound", appels=1, noeuds_evalues=evalues)
+
+    cost = int(borne_sup) if entiers else float(borne_sup)
+    path = [ordre[v] for v in meilleure]
+    if not details:
+        return (cost, path)
+    optimal = not interrompu
+    if optimal:
+        lower_bound = cost
+    else:
+        restants = [e[0] for e in file] + [nd.borne for nd in pile]
+        lower_bound = _entier(min(restants + [borne_sup]), entiers)
+        if borne_inf is not None:
+            lower_bound = max(lower_bound, _entier(borne_inf, entiers))
+    gap = max(cost - lower_bound, 0) / cost if cost > 0 else 0.0
+    infos = {"status": "Optimal" if optimal else "Feasible", "lower_bound": lower_bound, "gap": gap,
+             "nodes": evalues, "solve_time": time.perf_counter() - debut}
+    return (cost, path, infos)
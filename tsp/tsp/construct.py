@@ -0,0 +1,175 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+##Heuristiques de construction d'une tournée initiale
+
+#Ces heuristiques construisent rapidement, en O(n log n), une tournée à partir
+#des seules coordonnées (distance de Manhattan) grâce à un k-d tree. Partir
+#d'une bonne tournée réduit fortement le nombre de mouvements nécessaires à la
+#recherche locale ou à Lin-Kernighan.
+#Chaque fonction prend les coordonnées et la liste des sommets à visiter
+#('noeuds', le premier étant le dépôt; par défaut tous les sommets) et retourne
+#la tournée partant du dépôt et s'y terminant.
+
+
+def _points(coords, noeuds):
+    if noeuds is None:
+        noeuds = range(len(coords))
+    noeuds = list(noeuds)
+    return noeuds, np.array([coords[i] for i in noeuds], dtype=np.float64).reshape(-1, 2)
+
+
+def _tournee(cycle, noeuds):
+    return [noeuds[i] for i in cycle] + [noeuds[0]]
+
+
+def plus_proche_voisin(coords, noeuds=None):
+    """
+    Heuristique du plus proche voisin: depuis le dépôt, on va toujours au
+    sommet non visité le plus proche. Le k-d tree ne permettant pas de retirer
+    des points, on cherche les k plus proches voisins (k doublé tant qu'ils
+    sont tous visités) et l'arbre est reconstruit sur les sommets restants dès
+    que la moitié de ses points ont été visités.
+    """
+    noeuds, P = _points(coords, noeuds)
+    m = len(noeuds)
+    visite = np.zeros(m, dtype=bool)
+    visite[0] = True
+    actifs = np.arange(1, m)
+    arbre = cKDTree(P[actifs]) if m > 1 else None
+    retires = 0
+    cycle = [0]
+    courant = 0
+    for _ in range(m - 1):
+        k = min(8, len(actifs))
+        while True:
+            _, idx = arbre.query(P[courant], k=k, p=1)
+            libres = [v for v in actifs[np.atleast_1d(idx)] if not visite[v]]
+            if libres or k == len(actifs):
+                break
+            k = min(2 * k, len(actifs))
+        courant = int(libres[0])
+        visite[courant] = True
+        cycle.append(courant)
+        retires += 1
+        if 2 * retires > len(actifs) and len(cycle) < m:
+            # Reconstruction de l'arbre sur les sommets non visités
+            actifs = np.nonzero(~visite)[0]
+            arbre = cKDTree(P[actifs])
+            retires = 0
+    return _tournee(cycle, noeuds)
+
+
+def glouton_aretes(coords, noeuds=None, k=10):
+    """
+    Heuristique gloutonne sur les arêtes: les arêtes candidates (k plus proches
+    voisins) sont examinées par longueur croissante et retenues si leurs deux
+    extrémités sont de degré inférieur à 2 et appartiennent à des fragments
+    différents (union-find). Les fragments obtenus sont ensuite reliés de la
+    même façon à partir des voisins entre extrémités, puis le cycle est fermé.
+    """
+    noeuds, P = _points(coords, noeuds)
+    m = len(noeuds)
+    if m <= 2:
+        return _tournee(range(m), noeuds)
+    parent = list(range(m))
+    degre = [0] * m
+    adjacence = [[] for _ in range(m)]
+
+    def racine(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    fragments = m
+    sommets = np.arange(m)
+    while fragments > 1:
+        kk = min(k, len(sommets) - 1)
+        dist_k, idx = cKDTree(P[sommets]).query(P[sommets], k=kk + 1, p=1)
+        ordre = np.argsort(dist_k, axis=None, kind="stable")
+        ajout = False
+        for a, t in zip(*np.unravel_index(ordre, dist_k.shape)):
+            a, b = int(sommets[a]), int(sommets[idx[a, t]])
+            if a == b or degre[a] == 2 or degre[b] == 2:
+                continue
+            ra, rb = racine(a), racine(b)
+            if ra == rb:
+                continue
+            parent[ra] = rb
+            degre[a] += 1
+            degre[b] += 1
+            adjacence[a].append(b)
+            adjacence[b].append(a)
+            fragments -= 1
+            ajout = True
+        # On ne garde que les extrémités des fragments
+        sommets = np.array([v for v in range(m) if degre[v] < 2])
+        if not ajout:
+            k *= 2
+
+    # Fermeture du chemin hamiltonien puis parcours depuis le dépôt
+    a, b = [v for v in range(m) if degre[v] < 2]
+    adjacence[a].append(b)
+    adjacence[b].append(a)
+    cycle = [0]
+    precedent, courant = 0, adjacence[0][0]
+    while courant != 0:
+        cycle.append(courant)
+        suivant = adjacence[courant][0] if adjacence[courant][0] != precedent else adjacence[courant][1]
+        precedent, courant = courant, suivant
+    return _tournee(cycle, noeuds)
+
+
+def indices_hilbert(P, ordre=16):
+    """
+    Position de chaque point (array k x 2) sur la courbe de Hilbert d'ordre
+    'ordre' après mise à l'échelle des coordonnées sur une grille 2^ordre x 2^ordre.
+    """
+    n = 1 << ordre
+    mini = P.min(axis=0)
+    etendue = max(float((P.max(axis=0) - mini).max()), 1.0)
+    x = ((P[:, 0] - mini[0]) * ((n - 1) / etendue)).astype(np.int64)
+    y = ((P[:, 1] - mini[1]) * ((n - 1) / etendue)).astype(np.int64)
+    d = np.zeros(len(P), dtype=np.int64)
+    s = n // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        # Rotation du quadrant
+        retourne = ~ry & rx
+        x = np.where(retourne, n - 1 - x, x)
+        y = np.where(retourne, n - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        s //= 2
+    return d
+
+
+def courbe_hilbert(coords, noeuds=None, ordre=16):
+    """
+    Tournée obtenue en visitant les sommets dans l'ordre de la courbe de
+    Hilbert (courbe qui remplit le plan en préservant la proximité), à partir
+    du dépôt.
+    """
+    noeuds, P = _points(coords, noeuds)
+    cycle = np.argsort(indices_hilbert(P, ordre), kind="stable")
+    p = int(np.nonzero(cycle == 0)[0][0])
+    return _tournee(np.roll(cycle, -p).tolist(), noeuds)
+
+
+#Heuristiques disponibles pour construire la tournée initiale
+CONSTRUCTIONS = {
+    "ppv": plus_proche_voisin,
+    "glouton": glouton_aretes,
+    "hilbert": courbe_hilbert,
+}
+
+
+def tournee_initiale(noeuds, coords, construction):
+    """
+    Construit la tournée initiale sur les sommets 'noeuds' (le premier étant
+    le dépôt) avec 'construction', nom (clé de CONSTRUCTIONS) ou fonction.
+    """
+    f = CONSTRUCTIONS[construction] if isinstance(construction, str) else construction
+    return f(coords, noeuds)
@@ -0,0 +1,172 @@
+from rech_loc import listes_voisins, fonction_distance, recherche_locale
+from instrumentation import compter
+
+##Échanges entre tournées pour réduire le coût de la plus longue tournée
+
+#Après le clustering, chaque livreur a sa tournée et l'objectif est le coût de
+#la plus longue (min-max). On améliore la tournée la plus coûteuse A en
+#échangeant des clients avec une autre tournée B:
+#   - "relocate": un client de A est inséré dans B, à côté d'un de ses voisins;
+#   - "swap": un client de A et un client de B échangent leurs places;
+#   - "2opt*": A et B échangent leurs fins de tournée (A garde son début jusqu'à
+#     v puis suit la fin de B à partir de w, et inversement).
+#Les candidats w d'un client v sont ses plus proches voisins situés dans une
+#autre tournée, et chaque mouvement est évalué par différence à l'aide des
+#coûts cumulés le long des tournées. Un mouvement est retenu si les nouveaux
+#coûts de A et de B restent tous deux inférieurs à l'ancien coût de A: le
+#vecteur des coûts triés décroît strictement, ce qui assure l'arrêt.
+
+
+class Tournees:
+    """
+    Ensemble de tournées (listes non fermées commençant par le dépôt 0) avec,
+    pour chaque client, sa tournée et sa position, et pour chaque tournée ses
+    coûts cumulés: cumul[r][i] est le coût du trajet du dépôt jusqu'à la
+    position i et cumul[r][len] le coût total.
+    """
+
+    def __init__(self, tournees, d):
+        self.d = d
+        self.routes = [list(t[:-1]) if len(t) > 1 and t[0] == t[-1] else list(t) for t in tournees]
+        self.route = {}
+        self.pos = {}
+        self.cumul = [None] * len(self.routes)
+        for r in range(len(self.routes)):
+            self.mettre_a_jour(r)
+
+    def mettre_a_jour(self, r):
+        route, d = self.routes[r], self.d
+        cumul = [0]
+        for i in range(1, len(route) + 1):
+            cumul.append(cumul[-1] + d(route[i - 1], route[i] if i < len(route) else 0))
+        self.cumul[r] = cumul
+        for i, v in enumerate(route):
+            if i > 0:
+                self.route[v] = r
+                self.pos[v] = i
+
+    def cout(self, r):
+        return self.cumul[r][-1]
+
+    def sommet(self, r, i):
+        """Sommet en position i de la tournée r, le dépôt après le dernier client."""
+        route = self.routes[r]
+        return route[i] if i < len(route) else 0
+
+
+def relocate(T, v, w):
+    """Insère le client v (tournée A) à côté de w (tournée B)."""
+    d = T.d
+    A, B = T.route[v], T.route[w]
+    i, j = T.pos[v], T.pos[w]
+    p, s = T.routes[A][i - 1], T.sommet(A, i + 1)
+    nouveau_A = T.cout(A) + d(p, s) - d(p, v) - d(v, s)
+    meilleur = None
+    for k in (j, j + 1):   # entre (prédécesseur de w, w) ou (w, successeur de w)
+        x, y = T.routes[B][k - 1], T.sommet(B, k)
+        nouveau_B = T.cout(B) + d(x, v) + d(v, y) - d(x, y)
+        if meilleur is None or nouveau_B < meilleur[1]:
+            meilleur = (nouveau_A, nouveau_B, k)
+    nouveau_A, nouveau_B, k = meilleur
+
+    def appliquer():
+        del T.routes[A][i]
+        T.routes[B].insert(k, v)
+        del T.route[v]
+
+    return nouveau_A, nouveau_B, appliquer
+
+
+def swap(T, v, w):
+    """Échange les places du client v (tournée A) et du client w (tournée B)."""
+    d = T.d
+    A, B = T.route[v], T.route[w]
+    i, j = T.pos[v], T.pos[w]
+    p, s = T.routes[A][i - 1], T.sommet(A, i + 1)
+    pb, sb = T.routes[B][j - 1], T.sommet(B, j + 1)
+    nouveau_A = T.cout(A) + d(p, w) + d(w, s) - d(p, v) - d(v, s)
+    nouveau_B = T.cout(B) + d(pb, v) + d(v, sb) - d(pb, w) - d(w, sb)
+
+    def appliquer():
+        T.routes[A][i], T.routes[B][j] = w, v
+
+    return nouveau_A, nouveau_B, appliquer
+
+
+def deux_opt_etoile(T, v, w):
+    """
+    A garde son début jusqu'à v et se termine par la fin de B à partir de w;
+    B garde son début jusqu'au prédécesseur de w et se termine par la fin de A.
+    """
+    d = T.d
+    A, B = T.route[v], T.route[w]
+    i, j = T.pos[v], T.pos[w]
+    cA, cB = T.cumul[A], T.cumul[B]
+    nouveau_A = cA[i] + d(v, w) + cB[-1] - cB[j]
+    nouveau_B = cB[j - 1] + d(T.routes[B][j - 1], T.sommet(A, i + 1)) + cA[-1] - cA[i + 1]
+
+    def appliquer():
+        a, b = T.routes[A], T.routes[B]
+        T.routes[A], T.routes[B] = a[:i + 1] + b[j:], b[:j] + a[i + 1:]
+
+    return nouveau_A, nouveau_B, appliquer
+
+
+#Mouvements entre tournées disponibles pour equilibrer_tournees
+MOUVEMENTS_INTER = {
+    "relocate": relocate,
+    "swap": swap,
+    "2opt*": deux_opt_etoile,
+}
+
+
+def ameliorer_plus_longue(T, voisins, mouvements):
+    """
+    Cherche, pour les clients de la tournée la plus coûteuse A et leurs voisins
+    candidats situés dans une autre tournée, le premier mouvement qui réduit
+    le coût de A sans qu'aucune des deux tournées ne dépasse l'ancien coût de
+    A. Applique ce mouvement et retourne les deux tournées modifiées, ou None.
+    """
+    A = max(range(len(T.routes)), key=T.cout)
+    limite = T.cout(A)
+    evalues = 0
+    for v in T.routes[A][1:]:
+        for w in voisins[v]:
+            if w == 0 or T.route[w] == A:
+                continue
+            B = T.route[w]
+            for mouvement in mouvements:
+                evalues += 1
+                nouveau_A, nouveau_B, appliquer = mouvement(T, v, w)
+                if max(nouveau_A, nouveau_B) < limite:
+                    appliquer()
+                    compter("equilibrage", passages=1, mouvements_evalues=evalues, mouvements_appliques=1)
+                    return A, B
+    compter("equilibrage", passages=1, mouvements_evalues=evalues)
+    return None
+
+
+def equilibrer_tournees(tournees, coords, dist, voisins=None, k_voisins=10,
+                        mouvements=("relocate", "swap", "2opt*"), intra=True):
+    """
+    Réduit le coût de la plus longue tournée par des mouvements entre tournées
+    (noms ou fonctions de MOUVEMENTS_INTER) tant qu'un mouvement améliorant
+    existe. Les voisins candidats sont les k_voisins plus proches voisins de
+    chaque client (voir rech_loc.listes_voisins). Si intra est vrai, les deux
+    tournées modifiées sont réoptimisées par la recherche locale après chaque
+    mouvement.
+    Retourne les tournées (partant du dépôt et s'y terminant) et leurs coûts.
+    """
+    if voisins is None:
+        voisins = listes_voisins(coords, k_voisins)
+    mouvements = [MOUVEMENTS_INTER[mv] if isinstance(mv, str) else mv for mv in mouvements]
+    T = Tournees(tournees, fonction_distance(range(len(coords)), dist))
+    while True:
+        modifiees = ameliorer_plus_longue(T, voisins, mouvements)
+        if modifiees is None:
+            break
+        for r in modifiees:
+            if intra and len(T.routes[r]) > 3:
+                T.routes[r] = recherche_locale(T.routes[r] + [0], dist, voisins)[:-1]
+            T.mettre_a_jour(r)
+    return [route + [0] for route in T.routes], [T.cout(r) for r in range(len(T.routes))]
@@ -0,0 +1,100 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from progdyn import chemin_prdy
+from rech_loc import sous_matrice, normaliser_tournee
+from instrumentation import compter
+
+##Réoptimisation exacte d'une longue tournée par fenêtres glissantes
+
+#La programmation dynamique ne traite que des tournées d'une vingtaine de
+#sommets. Sur une longue tournée (par exemple issue de recherche_locale), on
+#considère des fenêtres de k sommets consécutifs: les deux extrémités de la
+#fenêtre sont fixées et l'ordre des k-2 sommets intérieurs est remplacé par le
+#plus court chemin hamiltonien entre ces extrémités (chemin_prdy, en
+#O(k² 2^k)). Les fenêtres d'une passe ne partagent que leurs extrémités: elles
+#sont indépendantes et peuvent être résolues en parallèle. D'une passe à
+#l'autre, les fenêtres sont décalées d'une demi-fenêtre pour que les
+#extrémités fixées changent; on s'arrête lorsque deux passes consécutives
+#n'apportent aucune amélioration.
+
+
+def _resoudre(matrices):
+    return [chemin_prdy(M, 0, len(M) - 1) for M in matrices]
+
+
+def decoupage(m, k, decalage=0):
+    """
+    Positions des fenêtres d'une passe sur un cycle de m sommets: fenêtres de
+    k sommets (la dernière pouvant être plus courte) partant de 'decalage',
+    deux fenêtres consécutives partageant une extrémité.
+    """
+    pas = k - 1
+    bornes = list(range(0, m, pas)) + [m]
+    return [[(decalage + q) % m for q in range(bornes[t], bornes[t + 1] + 1)]
+            for t in range(len(bornes) - 1)]
+
+
+def reoptimiser_fenetres(tour, dist, k=12, n_jobs=1, deadline=None, max_passes=None):
+    """
+    Réoptimise la tournée 'tour' en résolvant exactement, par programmation
+    dynamique, des fenêtres glissantes de k sommets consécutifs à extrémités
+    fixées (k entre 10 et 14 en pratique: le temps d'une fenêtre est en
+    O(k² 2^k)). Les fenêtres déjà optimales ne sont pas résolues à nouveau.
+    Si n_jobs vaut plus de 1 (None: tous les cœurs), les fenêtres d'une passe
+    sont réparties sur un pool de processus. Le calcul s'arrête à la date
+    deadline (voir time.time) si elle est donnée, ou après max_passes passes.
+    Retourne la tournée (partant du dépôt et s'y terminant).
+    """
+    cycle = normaliser_tournee(tour)
+    m = len(cycle)
+    k = min(k, m + 1)
+    if k < 4:
+        return cycle + [cycle[0]]
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    decalages = (0, (k - 1) // 2)
+    # Fenêtres (suites de sommets) dont l'ordre est déjà optimal
+    optimales = set()
+    passes = resolues = ameliorations = 0
+    sans_amelioration = 0
+    pool = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    try:
+        while sans_amelioration < len(decalages) and (max_passes is None or passes < max_passes):
+            if deadline is not None and time.time() >= deadline:
+                break
+            fenetres = []
+            for positions in decoupage(m, k, decalages[passes % len(decalages)]):
+                noeuds = tuple(cycle[q] for q in positions)
+                if len(noeuds) > 3 and noeuds not in optimales:
+                    fenetres.append((positions, noeuds))
+            passes += 1
+            matrices = [np.asarray(sous_matrice(noeuds, dist)) for _, noeuds in fenetres]
+            if pool is not None and len(matrices) > 1:
+                paquets = [matrices[r::n_jobs] for r in range(n_jobs)]
+                resultats = [None] * len(matrices)
+                for r, res in enumerate(pool.map(_resoudre, paquets)):
+                    resultats[r::n_jobs] = res
+            else:
+                resultats = _resoudre(matrices)
+            resolues += len(matrices)
+
+            ameliore = False
+            for (positions, noeuds), M, (poids, chemin) in zip(fenetres, matrices, resultats):
+                # Coûts comparés dans le type de la matrice (distances non
+                # entières possibles), à l'erreur d'arrondi près
+                actuel = M[np.arange(len(M) - 1), np.arange(1, len(M))].sum()
+                if poids < actuel - 1e-9 * abs(actuel):
+                    for q, r in zip(positions, chemin):
+                        cycle[q] = noeuds[r]
+                    noeuds = tuple(noeuds[r] for r in chemin)
+                    ameliore = True
+                    ameliorations += 1
+                optimales.add(noeuds)
+            sans_amelioration = 0 if ameliore else sans_amelioration + 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    compter("fenetres", passes=passes, fenetres_resolues=resolues, ameliorations=ameliorations)
+    return normaliser_tournee(cycle) + [0]
@@ -0,0 +1,269 @@
+import os
+import numpy as np
+
+##Lecture et écriture des instances et des tournées
+
+#Deux formats sont pris en charge:
+#   - TSPLIB (fichiers texte .tsp pour les instances et .tour pour les
+#     tournées), pour comparer les méthodes sur les jeux d'essai standards;
+#   - un format binaire numpy: .npy pour les seules coordonnées, que l'on peut
+#     projeter en mémoire (memory-map) sans les lire, et .npz (compressé) pour
+#     une instance accompagnée de tournées.
+#Dans les fichiers TSPLIB, les sommets sont numérotés à partir de 1; dans le
+#package, à partir de 0 (le sommet 0 étant le dépôt).
+
+#Types de distances pris en charge: Manhattan sur des coordonnées 2D (celle
+#du package), matrice explicite (EDGE_WEIGHT_SECTION), ou distances
+#euclidienne (EUC_2D, CEIL_2D) et pseudo-euclidienne (ATT) arrondies comme
+#dans TSPLIB, dont la matrice est calculée à la lecture
+TYPES_DISTANCES = ("MAN_2D", "EXPLICIT", "EUC_2D", "CEIL_2D", "ATT")
+
+
+def _distance_att(carres):
+    """Distance pseudo-euclidienne ATT: r = sqrt(d²/10), arrondi à l'entier
+    le plus proche puis augmenté de 1 s'il est inférieur à r."""
+    r = np.sqrt(carres / 10.0)
+    t = np.floor(r + 0.5)
+    return t + (t < r)
+
+
+#Arrondis des distances TSPLIB qui ne sont pas celle du package, en fonction
+#des carrés des distances euclidiennes (nint(x) = int(x + 0.5) dans TSPLIB)
+_ARRONDIS_TSPLIB = {
+    "EUC_2D": lambda carres: np.floor(np.sqrt(carres) + 0.5),
+    "CEIL_2D": lambda carres: np.ceil(np.sqrt(carres)),
+    "ATT": _distance_att,
+}
+
+#Formats de EDGE_WEIGHT_SECTION pris en charge: indices (ligne, colonne) des
+#valeurs, dans l'ordre du fichier, pour une matrice n x n. Seule FULL_MATRIX
+#donne toute la matrice; les formats triangulaires sont symétrisés.
+_FORMATS_MATRICE = {
+    "FULL_MATRIX": lambda n: np.indices((n, n)).reshape(2, -1),
+    "UPPER_ROW": lambda n: np.triu_indices(n, 1),
+    "LOWER_ROW": lambda n: np.tril_indices(n, -1),
+    "UPPER_DIAG_ROW": lambda n: np.triu_indices(n),
+    "LOWER_DIAG_ROW": lambda n: np.tril_indices(n),
+}
+
+
+def _nombres(lignes, i):
+    """Lit les nombres des lignes à partir de l'indice i jusqu'au prochain
+    mot-clé; retourne (liste des nombres, indice de la ligne suivante)."""
+    valeurs = []
+    while i < len(lignes):
+        mots = lignes[i].split()
+        if mots and not _est_nombre(mots[0]):
+            break
+        valeurs += mots
+        i += 1
+    return valeurs, i
+
+
+def _est_nombre(mot):
+    try:
+        float(mot)
+        return True
+    except ValueError:
+        return False
+
+
+def matrice_tsplib(coords, type_distance):
+    """
+    Matrice (int64) des distances TSPLIB de type 'type_distance' (EUC_2D,
+    CEIL_2D ou ATT) entre les sommets de coords, arrondies comme dans TSPLIB.
+    Elle est calculée ligne par ligne pour ne pas créer de tableau
+    intermédiaire n x n x 2.
+    """
+    arrondi = _ARRONDIS_TSPLIB[type_distance]
+    C = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    M = np.empty((len(C), len(C)), dtype=np.int64)
+    for i in range(len(C)):
+        M[i] = arrondi(((C - C[i]) ** 2).sum(axis=1))
+    return M
+
+
+def lire_tsplib(chemin):
+    """
+    Lit une instance TSPLIB (.tsp). Retourne le couple (coords, infos) où
+    coords est l'array des coordonnées (int32 si elles sont entières, float64
+    sinon; None si l'instance ne donne que les distances) et infos le
+    dictionnaire des champs de l'en-tête (NAME, TYPE, DIMENSION,
+    EDGE_WEIGHT_TYPE, ...), complété par la matrice des distances sous la clé
+    "matrice" lorsqu'elle est explicite (EDGE_WEIGHT_SECTION) ou que les
+    distances ne sont pas celle du package (EUC_2D, CEIL_2D, ATT: voir
+    matrice_tsplib).
+    Lève ValueError si EDGE_WEIGHT_TYPE n'est pas dans TYPES_DISTANCES, si
+    les coordonnées ne sont pas en 2D, si EDGE_WEIGHT_SECTION précède
+    DIMENSION ou si le format de la matrice n'est pas pris en charge.
+    """
+    with open(chemin) as f:
+        lignes = [l.strip() for l in f]
+    infos = {}
+    coords = None
+    i = 0
+    while i < len(lignes):
+        ligne = lignes[i]
+        i += 1
+        if not ligne or ligne == "EOF":
+            continue
+        if ligne.startswith("NODE_COORD_SECTION"):
+            valeurs, i = _nombres(lignes, i)
+            n = int(infos.get("DIMENSION", len(valeurs) // 3))
+            if infos.get("NODE_COORD_TYPE", "TWOD_COORDS") != "TWOD_COORDS" or len(valeurs) != 3 * n:
+                raise ValueError(f"NODE_COORD_SECTION: {n} sommets de coordonnées 2D attendus "
+                                 f"({len(valeurs)} valeurs lues)")
+            table = np.array(valeurs, dtype=np.float64).reshape(n, 3)
+            ordre = np.argsort(table[:, 0], kind="stable")
+            coords = table[ordre, 1:]
+            if np.all(coords == np.round(coords)):
+                coords = coords.astype(np.int32)
+        elif ligne.startswith("EDGE_WEIGHT_SECTION"):
+            valeurs, i = _nombres(lignes, i)
+            if "DIMENSION" not in infos:
+                raise ValueError("EDGE_WEIGHT_SECTION: DIMENSION doit être donnée dans l'en-tête, "
+                                 "avant la section")
+            n = int(infos["DIMENSION"])
+            format_matrice = infos.get("EDGE_WEIGHT_FORMAT", "FULL_MATRIX")
+            if format_matrice not in _FORMATS_MATRICE:
+                raise ValueError(f"EDGE_WEIGHT_FORMAT non pris en charge: {format_matrice}")
+            lignes_idx, colonnes_idx = _FORMATS_MATRICE[format_matrice](n)
+            if len(valeurs) < len(lignes_idx):
+                raise ValueError(f"EDGE_WEIGHT_SECTION: {len(lignes_idx)} valeurs attendues "
+                                 f"({len(valeurs)} lues)")
+            M = np.zeros((n, n), dtype=np.float64)
+            M[lignes_idx, colonnes_idx] = np.array(valeurs[:len(lignes_idx)], dtype=np.float64)
+            if format_matrice != "FULL_MATRIX":
+                M[colonnes_idx, lignes_idx] = M[lignes_idx, colonnes_idx]
+            infos["matrice"] = M.astype(np.int64) if np.all(M == np.round(M)) else M
+        elif ligne.endswith("_SECTION"):
+            # Autres sections (DISPLAY_DATA_SECTION, ...): ignorées
+            _, i = _nombres(lignes, i)
+        elif ":" in ligne:
+            cle, valeur = ligne.split(":", 1)
+            cle, valeur = cle.strip(), valeur.strip()
+            if cle == "EDGE_WEIGHT_TYPE" and valeur not in TYPES_DISTANCES:
+                raise ValueError(f"EDGE_WEIGHT_TYPE non pris en charge: {valeur} "
+                                 f"(attendu: {', '.join(TYPES_DISTANCES)})")
+            infos[cle] = valeur
+    if infos.get("EDGE_WEIGHT_TYPE") in _ARRONDIS_TSPLIB and coords is not None:
+        infos["matrice"] = matrice_tsplib(coords, infos["EDGE_WEIGHT_TYPE"])
+    return coords, infos
+
+
+def ecrire_tsplib(chemin, coords, nom=None, commentaire=None):
+    """Écrit les coordonnées (le dépôt en ligne 0) au format TSPLIB (.tsp)."""
+    coords = np.asarray(coords)
+    if nom is None:
+        nom = os.path.splitext(os.path.basename(chemin))[0]
+    entiers = np.issubdtype(coords.dtype, np.integer)
+    with open(chemin, "w") as f:
+        f.write(f"NAME : {nom}\n")
+        if commentaire:
+            f.write(f"COMMENT : {commentaire}\n")
+        f.write("TYPE : TSP\n")
+        f.write(f"DIMENSION : {len(coords)}\n")
+        f.write("EDGE_WEIGHT_TYPE : MAN_2D\n")
+        f.write("NODE_COORD_SECTION\n")
+        for k, (x, y) in enumerate(coords.tolist(), start=1):
+            f.write(f"{k} {x} {y}\n" if entiers else f"{k} {x!r} {y!r}\n")
+        f.write("EOF\n")
+
+
+def lire_tournee(chemin):
+    """
+    Lit une tournée TSPLIB (.tour) et la retourne sous forme d'une liste
+    d'indices (à partir de 0) partant du sommet 0 et s'y terminant.
+    """
+    with open(chemin) as f:
+        lignes = [l.strip() for l in f]
+    debut = next(i for i, l in enumerate(lignes) if l.startswith("TOUR_SECTION")) + 1
+    tour = []
+    for mot in " ".join(lignes[debut:]).split():
+        if mot == "-1" or mot == "EOF":
+            break
+        tour.append(int(mot) - 1)
+    p = tour.index(0)
+    tour = tour[p:] + tour[:p]
+    return tour + [0]
+
+
+def ecrire_tournee(chemin, tour, nom=None):
+    """Écrit une tournée (fermée ou non) au format TSPLIB (.tour)."""
+    if len(tour) > 1 and tour[0] == tour[-1]:
+        tour = tour[:-1]
+    if nom is None:
+        nom = os.path.splitext(os.path.basename(chemin))[0]
+    with open(chemin, "w") as f:
+        f.write(f"NAME : {nom}\n")
+        f.write("TYPE : TOUR\n")
+        f.write(f"DIMENSION : {len(tour)}\n")
+        f.write("TOUR_SECTION\n")
+        for v in tour:
+            f.write(f"{int(v) + 1}\n")
+        f.write("-1\nEOF\n")
+
+
+def _coords_int32(coords):
+    """
+    Coordonnées converties en array contigu int32 de forme (n, 2). Lève
+    ValueError si elles ne sont pas entières ou sortent de l'intervalle des
+    int32, plutôt que de les tronquer silencieusement.
+    """
+    C = np.asarray(coords)
+    if C.size % 2:
+        raise ValueError(f"Coordonnées 2D attendues ({C.size} valeurs)")
+    if C.size and not np.issubdtype(C.dtype, np.integer):
+        if not np.issubdtype(C.dtype, np.floating) or not np.all(C == np.round(C)):
+            raise ValueError("Coordonnées non entières: le format binaire est en int32")
+    limites = np.iinfo(np.int32)
+    if C.size and (C.min() < limites.min or C.max() > limites.max):
+        raise ValueError(f"Coordonnées hors de l'intervalle des int32 [{limites.min}, {limites.max}]")
+    return np.ascontiguousarray(C, dtype=np.int32).reshape(-1, 2)
+
+
+def enregistrer_coords(chemin, coords):
+    """Enregistre les coordonnées dans un fichier .npy (int32). Lève
+    ValueError si elles ne sont pas entières ou ne tiennent pas en int32."""
+    np.save(chemin, _coords_int32(coords))
+
+
+def charger_coords(chemin, mmap=True):
+    """
+    Charge les coordonnées d'un fichier .npy. Avec mmap, le fichier est
+    projeté en mémoire en lecture seule: l'ouverture est immédiate quelle que
+    soit la taille, seules les pages utilisées sont lues, et plusieurs
+    processus qui ouvrent le même fichier en partagent les pages.
+    """
+    return np.load(chemin, mmap_mode="r" if mmap else None)
+
+
+def enregistrer_npz(chemin, coords, tournees=None):
+    """Enregistre une instance et, éventuellement, des tournées dans un
+    fichier .npz compressé. Les coordonnées sont vérifiées comme pour
+    enregistrer_coords."""
+    donnees = {"coords": _coords_int32(coords)}
+    for k, tour in enumerate(tournees or []):
+        donnees[f"tournee_{k}"] = np.asarray(tour, dtype=np.int64)
+    np.savez_compressed(chemin, **donnees)
+
+
+def charger_npz(chemin):
+    """Charge un fichier .npz écrit par enregistrer_npz; retourne le couple
+    (coords, liste des tournées)."""
+    with np.load(chemin) as donnees:
+        coords = donnees["coords"]
+        nb = sum(1 for cle in donnees.files if cle.startswith("tournee_"))
+        tournees = [donnees[f"tournee_{k}"].tolist() for k in range(nb)]
+    return coords, tournees
+
+
+def charger_instance(chemin, mmap=True):
+    """Charge les coordonnées d'une instance selon l'extension du fichier
+    (.tsp, .npy projeté en mémoire si mmap est vrai, ou .npz)."""
+    extension = os.path.splitext(chemin)[1].lower()
+    if extension == ".npy":
+        return charger_coords(chemin, mmap)
+    if extension == ".npz":
+        return charger_npz(chemin)[0]
+    return lire_tsplib(chemin)[0]
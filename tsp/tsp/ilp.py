@@ -1,5 +1,13 @@
+import os
+import re
+import tempfile
+import time
+import numpy as np
 import pulp
-from pulp import LpVariable, LpProblem, LpMinimize, LpStatus, lpSum, value
+from pulp import LpVariable, LpProblem, LpMinimize, LpStatus, value
+from pulp import LpAffineExpression, LpConstraint, LpConstraintEQ, LpConstraintLE
+from utils import distance_matrix
+from instrumentation import compter
 
 ##Code pour résoudre tsp via un problème d'optimisation linéaire
 
@@ -31,31 +39,34 @@ def create_variables_u(n,origin):
 
     return u
         
+# Les expressions linéaires sont construites directement à partir de listes de
+# couples (variable, coefficient), ce qui évite de créer une expression
+# intermédiaire pour chaque produit coefficient*variable.
+
+def arcs(n):
+    return [(i,j) for i in range(n) for j in range(n) if i!=j]
+
 # Pour créer la fonction objectif (fonction à minimiser)
 
-def add_objective_func(problem,n,distances,x_var):
-    T = []
-    for i in range(n):
-        for j in range(i+1,n):
-            T.append(distances[i][j]*x_var[i][j])
-            T.append(distances[j][i]*x_var[j][i])
+def objective_expression(n,distances,x_var):
+    M=distance_matrix(distances)
+    A=np.array(arcs(n)).reshape(-1,2)
+    coeffs=M[A[:,0],A[:,1]].tolist()
+    return LpAffineExpression([(x_var[i][j],c) for (i,j),c in zip(A.tolist(),coeffs)])
 
-    problem += lpSum(T)
+def add_objective_func(problem,n,distances,x_var):
+    problem.setObjective(objective_expression(n,distances,x_var))
     return problem
 
 #déclaration des contraintes
 
 def add_basic_constraints(problem,n,x_var):
     for i in range(n):
-        T_1 = []
-        T_2 = []
-        for j in range(n):
-            if i!=j:
-                T_1.append(1*x_var[i][j])
-                T_2.append(1*x_var[j][i])
+        T_1 = LpAffineExpression([(x_var[i][j],1) for j in range(n) if j!=i])
+        T_2 = LpAffineExpression([(x_var[j][i],1) for j in range(n) if j!=i])
 
-        problem += (lpSum(T_1) == 1)
-        problem += (lpSum(T_2) == 1)
+        problem += LpConstraint(T_1, LpConstraintEQ, rhs=1)
+        problem += LpConstraint(T_2, LpConstraintEQ, rhs=1)
 
     return problem
 
@@ -64,37 +75,253 @@ def add_special_constraints(problem,n,origin,x_var,u_var):
         if i!=origin:
             for j in range(n):
                 if j!=origin and j!=i:
-                    temp = lpSum([1*u_var[i],(-1)*u_var[j],(n-1)*x_var[i][j]])
-                    problem += ( temp <= (n-2))
+                    temp = LpAffineExpression([(u_var[i],1),(u_var[j],-1),(x_var[i][j],n-1)])
+                    problem += LpConstraint(temp, LpConstraintLE, rhs=n-2)
 
     return problem
 
-# Définition du problème TSP sous forme ILP
+# Contraintes d'élimination des sous-tours (formulation DFJ), ajoutées au fur
+# et à mesure: on résout le problème avec les seules contraintes de degré, on
+# cherche les sous-tours de la solution entière obtenue et on n'ajoute que les
+# contraintes violées avant de résoudre à nouveau.
+
+def add_two_cycle_constraints(problem,n,x_var):
+    for i in range(n):
+        for j in range(i+1,n):
+            problem += LpConstraint(LpAffineExpression([(x_var[i][j],1),(x_var[j][i],1)]), LpConstraintLE, rhs=1)
+
+    return problem
+
+def find_subtours(n,x_var):
+    successor=[None]*n
+    for i in range(n):
+        for j in range(n):
+            if j!=i and value(x_var[i][j]) > 0.5:
+                successor[i]=j
+                break
+
+    subtours=[]
+    seen=[False]*n
+    for i in range(n):
+        if not seen[i]:
+            cycle=[]
+            step=i
+            while not seen[step]:
+                seen[step]=True
+                cycle.append(step)
+                step=successor[step]
+            subtours.append(cycle)
+
+    return subtours
+
+def add_subtour_constraints(problem,x_var,subtours):
+    for S in subtours:
+        T = LpAffineExpression([(x_var[i][j],1) for i in S for j in S if i!=j])
+        problem += LpConstraint(T, LpConstraintLE, rhs=len(S)-1)
+
+    return problem
+
+# Solution initiale (MIP start): une tournée connue, par exemple obtenue par la
+# recherche locale ou le 2-approx, est transmise au solveur et son coût sert de
+# borne supérieure (cutoff): seules les solutions au moins aussi bonnes sont
+# explorées.
 
-def tsp_ilp_solver(origin,distances):
-    n=len(distances)
-    x_var=create_variables_x(n)
-    u_var=create_variables_u(n,origin)
-    problem=LpProblem("TSP_ILP",LpMinimize)
-    problem=add_objective_func(problem,n,distances, x_var)
-    problem=add_basic_constraints(problem,n,x_var)
-    problem=add_special_constraints(problem,n,origin,x_var,u_var)
-    solver = pulp.PULP_CBC_CMD(msg=False)
-    problem.solve(solver)
-    print("Status:", LpStatus[problem.status])
-    
+def set_initial_tour(n,origin,x_var,u_var,tour):
+    succ={tour[k]:tour[k+1] for k in range(len(tour)-1)}
+    for i in range(n):
+        for j in range(n):
+            if i!=j:
+                x_var[i][j].setInitialValue(1 if succ.get(i)==j else 0)
+    if u_var is not None:
+        rank=0
+        step=origin
+        for k in range(n-1):
+            step=succ[step]
+            rank+=1
+            u_var[step].setInitialValue(rank)
+
+def tour_cost(tour,distances):
+    return float(sum(distances[tour[k]][tour[k+1]] for k in range(len(tour)-1)))
+
+def make_solver(initial_cost,time_limit,log_path,warm_start=True):
+    options=[]
+    if initial_cost is not None:
+        options.append("cutoff "+str(initial_cost))
+    return pulp.PULP_CBC_CMD(msg=False, warmStart=warm_start and initial_cost is not None,
+                             timeLimit=time_limit, options=options, logPath=log_path)
+
+# Lecture de la borne inférieure dans le journal de CBC (None si absente)
+
+def read_lower_bound(log_path):
+    with open(log_path) as f:
+        found=re.findall(r"Lower bound:\s*(-?[0-9.eE+-]+)", f.read())
+    return float(found[-1]) if found else None
+
+def remaining_time(deadline):
+    if deadline is None:
+        return None
+    return max(deadline-time.time(),0.01)
+
+def solve_with_limit(problem,initial_cost,deadline,log_path):
+    compter("ilp",appels_solveur=1)
+    try:
+        problem.solve(make_solver(initial_cost,remaining_time(deadline),log_path))
+    except pulp.PulpSolverError:
+        # CBC peut s'arrêter brutalement lorsque la limite de temps tombe
+        # pendant le traitement de la solution initiale: on relance sans elle
+        # (la borne supérieure est conservée)
+        compter("ilp",appels_solveur=1)
+        problem.solve(make_solver(initial_cost,remaining_time(deadline),log_path,warm_start=False))
+    return problem
+
+# has_solution: le solveur a-t-il trouvé une solution entière réalisable?
+
+def has_solution(problem):
+    return problem.sol_status in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible)
+
+# Retourne (problem, optimal, bound): optimal indique si la solution du
+# problème est un cycle hamiltonien optimal et bound est le coût de la dernière
+# relaxation résolue à l'optimalité (borne inférieure), None s'il n'y en a pas.
+
+def solve_dfj(problem,n,x_var,initial_cost=None,deadline=None,log_path=None):
+    bound=None
+    while True:
+        problem=solve_with_limit(problem,initial_cost,deadline,log_path)
+        if problem.sol_status != pulp.LpSolutionOptimal:
+            return problem, False, bound
+        bound=value(problem.objective)
+        subtours=find_subtours(n,x_var)
+        if len(subtours) == 1:
+            return problem, True, bound
+        problem=add_subtour_constraints(problem,x_var,subtours)
+        compter("ilp",coupes_sous_tours=len(subtours))
+        if deadline is not None and time.time() >= deadline:
+            return problem, False, bound
+
+def extract_path(n,origin,x_var):
     path=[None]*(n+1)
     path[0]=origin
     step=origin
     for i in range(0,n+1):
         path[i]=step
         for j in range(0,n):
-            if j!=step and (value(x_var[step][j]) == 1):
+            if j!=step and (value(x_var[step][j]) > 0.5):
               step = j
               break
 
-    return (value(problem.objective), path)
+    return path
+
+# Modèle ILP réutilisable: les variables et les contraintes ne dépendent que du
+# nombre de sommets n, du sommet de départ origin et du mode; elles sont créées
+# une seule fois et seule la fonction objectif est remplacée à chaque
+# résolution avec de nouvelles distances. En mode "dfj", les contraintes
+# d'élimination des sous-tours ajoutées lors d'une résolution restent valables
+# pour les suivantes et sont conservées.
+# Les temps de construction (build_time), de mise à jour de l'objectif
+# (objective_time) et de résolution (solve_time) sont mesurés séparément.
+
+class TspIlpModel:
+
+    def __init__(self,n,origin,mode="mtz"):
+        start=time.perf_counter()
+        self.n=n
+        self.origin=origin
+        self.mode=mode
+        self.x_var=create_variables_x(n)
+        self.u_var=None
+        self.problem=LpProblem("TSP_ILP",LpMinimize)
+        self.problem=add_basic_constraints(self.problem,n,self.x_var)
+        if mode == "dfj":
+            self.problem=add_two_cycle_constraints(self.problem,n,self.x_var)
+        else:
+            self.u_var=create_variables_u(n,origin)
+            self.problem=add_special_constraints(self.problem,n,origin,self.x_var,self.u_var)
+        A=arcs(n)
+        self.rows=np.array([i for i,j in A],dtype=np.intp)
+        self.cols=np.array([j for i,j in A],dtype=np.intp)
+        self.arc_vars=[self.x_var[i][j] for i,j in A]
+        self.build_time=time.perf_counter()-start
+        self.objective_time=None
+        self.solve_time=None
 
+    def set_distances(self,distances):
+        start=time.perf_counter()
+        M=distance_matrix(distances)
+        coeffs=M[self.rows,self.cols].tolist()
+        self.problem.setObjective(LpAffineExpression(list(zip(self.arc_vars,coeffs))))
+        self.objective_time=time.perf_counter()-start
 
+    # Résolution avec les distances données (voir tsp_ilp_solver pour les
+    # paramètres et la valeur de retour)
 
+    def solve(self,distances,initial_tour=None,time_limit=None,details=False):
+        n,origin,mode=self.n,self.origin,self.mode
+        x_var,u_var=self.x_var,self.u_var
+        self.set_distances(distances)
+        start=time.perf_counter()
+        deadline=None if time_limit is None else time.time()+time_limit
+        initial_cost=None if initial_tour is None else tour_cost(initial_tour,distances)
+        if initial_tour is not None:
+            set_initial_tour(n,origin,x_var,u_var,initial_tour)
+
+        fd,log_path=tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        try:
+            if mode == "dfj":
+                self.problem,optimal,bound=solve_dfj(self.problem,n,x_var,initial_cost,deadline,log_path)
+            else:
+                self.problem=solve_with_limit(self.problem,initial_cost,deadline,log_path)
+                optimal=self.problem.sol_status == pulp.LpSolutionOptimal
+                bound=None
+            lower_bound=read_lower_bound(log_path)
+        finally:
+            os.remove(log_path)
+        problem=self.problem
+        if bound is not None and (lower_bound is None or bound > lower_bound):
+            lower_bound=bound
+        print("Status:", LpStatus[problem.status])
+
+        if optimal or (mode != "dfj" and has_solution(problem)):
+            cost,path=value(problem.objective),extract_path(n,origin,x_var)
+        elif has_solution(problem) and len(find_subtours(n,x_var)) == 1 and \
+                (initial_cost is None or value(problem.objective) < initial_cost):
+            # DFJ interrompu par la limite de temps: la solution entière du
+            # solveur est conservée si c'est un cycle hamiltonien meilleur que
+            # la tournée initiale
+            cost,path=value(problem.objective),extract_path(n,origin,x_var)
+        else:
+            # Aucune tournée meilleure que la tournée initiale n'a été trouvée;
+            # si le problème est infaisable, c'est à cause de la borne (cutoff):
+            # la tournée initiale est alors optimale.
+            cost,path=initial_cost,initial_tour
+            optimal=initial_tour is not None and problem.status == pulp.LpStatusInfeasible
+        if optimal:
+            lower_bound=cost
+        self.solve_time=time.perf_counter()-start
+
+        if not details:
+            return (cost, path)
+        gap=None
+        if cost is not None and lower_bound is not None:
+            gap=max(cost-lower_bound,0)/cost if cost > 0 else 0.0
+        infos={"status": "Optimal" if optimal else "Not Solved" if cost is None else "Feasible",
+               "lower_bound": lower_bound, "gap": gap,
+               "build_time": self.build_time, "objective_time": self.objective_time,
+               "solve_time": self.solve_time}
+        return (cost, path, infos)
+
+# Définition du problème TSP sous forme ILP
+# mode="mtz": contraintes de Miller-Tucker-Zemlin (variables u)
+# mode="dfj": contraintes d'élimination des sous-tours ajoutées à la demande
+# initial_tour: tournée initiale (MIP start) dont le coût borne la recherche
+# time_limit: temps maximal en secondes; on retourne alors la meilleure
+# tournée trouvée (éventuellement initial_tour)
+# details=True: on retourne en plus un dictionnaire avec le statut, la borne
+# inférieure, l'écart relatif à l'optimalité (gap, 0 si optimal) et les temps
+# de construction du modèle et de résolution
+# model: modèle TspIlpModel déjà construit pour (n, origin, mode) à réutiliser
 
+def tsp_ilp_solver(origin,distances,mode="mtz",initial_tour=None,time_limit=None,details=False,model=None):
+    if model is None:
+        model=TspIlpModel(len(distances),origin,mode)
+    return model.solve(distances,initial_tour,time_limit,details)
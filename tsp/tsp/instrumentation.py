@@ -0,0 +1,64 @@
+import time
+from contextlib import contextmanager
+
+##Compteurs d'instrumentation (désactivés par défaut)
+
+#Les fonctions du package accumulent leurs compteurs dans des variables locales
+#et ne les transmettent qu'une fois par appel avec compter(): lorsque
+#l'instrumentation est désactivée, le coût se limite à ce seul appel, hors des
+#boucles de calcul. Les compteurs sont regroupés par module:
+#   {"rech_loc": {"mouvements_evalues": ..., "mouvements_appliques": ..., ...},
+#    "temps_phases": {"clustering": ..., "construction": ..., ...}, ...}
+
+#Compteurs actifs (None: instrumentation désactivée)
+_compteurs = None
+
+
+def activer(compteurs=None):
+    """Active l'instrumentation; les compteurs sont ajoutés au dictionnaire
+    'compteurs' (nouveau dictionnaire par défaut), qui est retourné."""
+    global _compteurs
+    _compteurs = {} if compteurs is None else compteurs
+    return _compteurs
+
+
+def desactiver():
+    """Désactive l'instrumentation et retourne les compteurs accumulés."""
+    global _compteurs
+    compteurs, _compteurs = _compteurs, None
+    return compteurs
+
+
+def actif():
+    return _compteurs is not None
+
+
+def compter(groupe, **valeurs):
+    """Ajoute les valeurs aux compteurs du groupe (module) 'groupe'."""
+    if _compteurs is None:
+        return
+    g = _compteurs.setdefault(groupe, {})
+    for nom, v in valeurs.items():
+        g[nom] = g.get(nom, 0) + v
+
+
+def fusionner(compteurs):
+    """Ajoute des compteurs accumulés ailleurs (par exemple dans un processus
+    fils) aux compteurs actifs."""
+    if _compteurs is None or not compteurs:
+        return
+    for groupe, valeurs in compteurs.items():
+        compter(groupe, **valeurs)
+
+
+@contextmanager
+def phase(nom):
+    """Mesure le temps passé dans le bloc et l'ajoute à temps_phases[nom]."""
+    if _compteurs is None:
+        yield
+        return
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        compter("temps_phases", **{nom: time.perf_counter() - debut})
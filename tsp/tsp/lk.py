@@ -0,0 +1,156 @@
+import time
+from collections import deque
+from construct import tournee_initiale
+from instrumentation import compter
+from rech_loc import normaliser_tournee, cycle_vers_tournee, preparer_candidats, inverser
+
+##Heuristique de Lin-Kernighan (version "LK à base de 2-opt")
+
+#Un mouvement de Lin-Kernighan est une suite de 2-opt enchaînés: on retire
+#l'arête (t1,t2), on ajoute (t2,t3) vers un voisin candidat de t2 et on retire
+#(t3,t4) de façon que la fermeture (t4,t1) redonne un cycle. Le sommet t4
+#devient le nouveau t2 et on continue tant que le gain partiel reste positif.
+#On conserve finalement le préfixe de la suite qui donne le meilleur gain et
+#on annule les 2-opt suivants.
+
+
+class Tour:
+    """
+    Représentation d'un cycle par tableau: tour[p] est le sommet en position p
+    et pos[v] la position du sommet v. Les requêtes suiv, prec et entre sont en
+    O(1); un 2-opt inverse le plus court des deux segments concernés.
+    """
+
+    def __init__(self, cycle):
+        self.tour = list(cycle)
+        self.m = len(self.tour)
+        self.pos = [0] * self.m
+        for p, v in enumerate(self.tour):
+            self.pos[v] = p
+
+    def suiv(self, v):
+        return self.tour[(self.pos[v] + 1) % self.m]
+
+    def prec(self, v):
+        return self.tour[(self.pos[v] - 1) % self.m]
+
+    def entre(self, a, b, c):
+        """Indique si b se trouve sur le chemin allant de a à c dans le sens du cycle."""
+        pa = self.pos[a]
+        return (self.pos[b] - pa) % self.m <= (self.pos[c] - pa) % self.m
+
+    def deux_opt(self, t1, t2, t3, t4):
+        """
+        Remplace les arêtes (t1,t2) et (t4,t3) par (t2,t3) et (t1,t4), le cycle
+        étant t1 t2 ... t4 t3 dans un sens ou dans l'autre. Le mouvement
+        inverse est deux_opt(t1, t4, t3, t2).
+        """
+        if self.suiv(t1) == t2:
+            inverser(self.tour, self.pos, self.pos[t2], self.pos[t4])
+        else:
+            inverser(self.tour, self.pos, self.pos[t4], self.pos[t2])
+
+
+def mouvement_lk(T, d, voisins, t1, t2, profondeur_max):
+    """
+    Construit une suite de 2-opt à partir de l'arête (t1,t2) et applique le
+    meilleur préfixe. Retourne le gain obtenu (0 si aucun) et les sommets dont
+    une arête a changé.
+    """
+    g = d(t1, t2)
+    faits = []
+    ajoutees = set()
+    meilleur_gain, meilleur_k = 0, 0
+    for _ in range(profondeur_max):
+        # t4 doit précéder t3 dans le sens où t2 suit t1
+        avant = T.prec if T.suiv(t1) == t2 else T.suiv
+        choix = None
+        for t3 in voisins[t2]:
+            g1 = g - d(t2, t3)
+            if g1 <= 0:
+                break
+            if t3 == t1:
+                continue
+            t4 = avant(t3)
+            if t4 == t2 or (t3, t4) in ajoutees or (t4, t3) in ajoutees:
+                continue
+            # Critère de choix: gain après avoir retiré (t3,t4)
+            valeur = g1 + d(t3, t4)
+            if choix is None or valeur > choix[0]:
+                choix = (valeur, t3, t4)
+        if choix is None:
+            break
+        g, t3, t4 = choix
+        T.deux_opt(t1, t2, t3, t4)
+        faits.append((t2, t3, t4))
+        ajoutees.add((t2, t3))
+        gain = g - d(t4, t1)
+        if gain > meilleur_gain:
+            meilleur_gain, meilleur_k = gain, len(faits)
+        t2 = t4
+
+    # Annulation des 2-opt au-delà du meilleur préfixe
+    for t2, t3, t4 in reversed(faits[meilleur_k:]):
+        T.deux_opt(t1, t4, t3, t2)
+    touches = {t1}
+    for t2, t3, t4 in faits[:meilleur_k]:
+        touches.update((t2, t3, t4))
+    return meilleur_gain, touches
+
+
+def lk_voisins(cycle, d, voisins, profondeur_max=50, deadline=None):
+    """
+    Applique Lin-Kernighan sur 'cycle' (liste non fermée d'indices locaux,
+    modifiée sur place) avec des "don't-look bits" sur t1, jusqu'à la date
+    deadline (voir time.time) si elle est donnée.
+    Retourne la variation totale du coût (négative ou nulle).
+    """
+    m = len(cycle)
+    if m < 4:
+        return 0
+    T = Tour(cycle)
+    actifs = deque(T.tour)
+    en_attente = [True] * m
+    delta_total = 0
+    compteur = 0
+    evalues = appliques = 0
+    while actifs:
+        if deadline is not None and compteur % 64 == 63 and time.time() >= deadline:
+            break
+        compteur += 1
+        t1 = actifs.popleft()
+        en_attente[t1] = False
+        for t2 in (T.suiv(t1), T.prec(t1)):
+            evalues += 1
+            gain, touches = mouvement_lk(T, d, voisins, t1, t2, profondeur_max)
+            if gain > 0:
+                delta_total -= gain
+                appliques += 1
+                for v in touches:
+                    if not en_attente[v]:
+                        en_attente[v] = True
+                        actifs.append(v)
+                break
+    cycle[:] = T.tour
+    compter("lk", sommets_examines=compteur, passages=-(-compteur // m),
+            mouvements_evalues=evalues, mouvements_appliques=appliques)
+    return delta_total
+
+
+def lin_kernighan(tour, dist, voisins=None, k_voisins=10, profondeur_max=50, construction=None, deadline=None):
+    """
+    Optimise une tournée par l'heuristique de Lin-Kernighan restreinte aux
+    listes de voisins candidats (voir rech_loc.listes_voisins; à défaut, les
+    k_voisins plus proches voisins de chaque sommet de la tournée).
+    Si 'construction' est donné, on part de la tournée construite sur les
+    mêmes sommets (voir rech_loc.recherche_locale). La recherche s'arrête à
+    la date deadline (voir time.time) si elle est donnée.
+    Retourne la tournée partant du dépôt et s'y terminant.
+    """
+    noeuds = normaliser_tournee(tour)
+    if construction is not None:
+        noeuds = normaliser_tournee(tournee_initiale(noeuds, dist.coords, construction))
+    d, voisins_locaux = preparer_candidats(noeuds, dist, voisins, k_voisins)
+    cycle = list(range(len(noeuds)))
+    lk_voisins(cycle, d, voisins_locaux, profondeur_max, deadline)
+    return cycle_vers_tournee(cycle, noeuds)
@@ -0,0 +1,146 @@
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils import LazyInstance, evaluate_solution, create_shared_array, attach_shared_array
+from construct import CONSTRUCTIONS
+from rech_loc import recherche_locale, listes_voisins, normaliser_tournee
+from instrumentation import compter
+
+##Recherche locale à départs multiples
+
+#La recherche locale est déterministe: partant d'une même tournée, elle
+#aboutit toujours au même optimum local. On la relance donc depuis plusieurs
+#départs diversifiés, chacun avec sa propre graine:
+#   - "aleatoire": tournée aléatoire;
+#   - "double_pont": tournée initiale perturbée par un double pont (4-opt qui
+#     échange deux segments, et que la recherche locale défait difficilement);
+#   - "ils": recherche locale itérée, qui enchaîne double pont et recherche
+#     locale en ne conservant une perturbation que si elle améliore la tournée.
+#Les départs sont indépendants et peuvent être répartis sur un pool de
+#processus; la meilleure tournée est conservée.
+
+STRATEGIES = ("aleatoire", "double_pont", "ils")
+
+
+def double_pont(tour, rng):
+    """
+    Perturbation "double pont" d'une tournée (fermée, partant du dépôt 0):
+    la tournée A B C D devient A C B D, le dépôt restant en tête.
+    """
+    cycle = normaliser_tournee(tour)
+    m = len(cycle)
+    if m < 8:
+        return cycle + [cycle[0]]
+    i, j, k = sorted(rng.choice(np.arange(1, m), size=3, replace=False).tolist())
+    cycle = cycle[:i] + cycle[j:k] + cycle[i:j] + cycle[k:]
+    return cycle + [cycle[0]]
+
+
+def depart(tour, dist, voisins, strategie="ils", graine=None, mouvements=("2opt", "oropt"),
+           iterations=50, deadline=None):
+    """
+    Exécute un départ de la recherche locale à partir de la tournée 'tour'
+    diversifiée selon 'strategie' (voir STRATEGIES), avec le générateur
+    aléatoire de graine 'graine' (entier ou numpy.random.SeedSequence). Pour
+    "ils", 'iterations' perturbations sont essayées.
+    Retourne le triplet (coût, tournée, perturbations acceptées), ou None si
+    deadline (voir time.time) est dépassée avant le départ.
+    """
+    if deadline is not None and time.time() >= deadline:
+        return None
+    rng = np.random.default_rng(graine)
+    if strategie == "aleatoire":
+        clients = normaliser_tournee(tour)[1:]
+        debut = [0] + rng.permutation(clients).tolist() + [0]
+    elif strategie in ("double_pont", "ils"):
+        debut = double_pont(tour, rng)
+    else:
+        raise ValueError(f"Stratégie inconnue: {strategie}")
+    tour = recherche_locale(debut, dist, voisins, mouvements, deadline=deadline)
+    cout = evaluate_solution(tour, dist)
+    acceptees = 0
+    if strategie == "ils":
+        for _ in range(iterations):
+            if deadline is not None and time.time() >= deadline:
+                break
+            candidat = recherche_locale(double_pont(tour, rng), dist, voisins, mouvements, deadline=deadline)
+            cout_candidat = evaluate_solution(candidat, dist)
+            if cout_candidat < cout:
+                tour, cout = candidat, cout_candidat
+                acceptees += 1
+    return cout, tour, acceptees
+
+
+# Instance et listes de voisins d'un processus fils, construites une seule fois.
+# Avec les listes de voisins, la recherche locale ne lit que les coordonnées:
+# l'instance des fils n'a donc pas de matrice des distances (mémoire en O(n)
+# par processus, quelle que soit l'instance du processus parent).
+_worker = {}
+
+
+def _init_worker(nom, shape, dtype, k_voisins):
+    shm, coords = attach_shared_array(nom, shape, dtype)
+    instance = LazyInstance(coords)
+    _worker.update(segment=shm, instance=instance, voisins=listes_voisins(coords, k_voisins))
+
+
+def _depart_worker(tour, strategie, graine, mouvements, iterations, deadline):
+    return depart(tour, _worker["instance"], _worker["voisins"], strategie, graine,
+                  mouvements, iterations, deadline)
+
+
+def multi_start(instance, n_departs=8, strategie="ils", graine=0, time_budget=None, n_jobs=1,
+                construction="glouton", k_voisins=10, mouvements=("2opt", "oropt"), iterations=50):
+    """
+    Recherche locale à 'n_departs' départs diversifiés selon 'strategie' à
+    partir de la tournée construite par 'construction' (voir
+    construct.CONSTRUCTIONS) sur 'instance' (Instance ou LazyInstance). Les
+    graines des départs sont dérivées de 'graine' (numpy.random.SeedSequence),
+    ce qui rend les résultats reproductibles et indépendants de n_jobs.
+    Si n_jobs vaut plus de 1 (None: tous les cœurs), les départs sont répartis
+    sur un pool de processus qui lisent les coordonnées en mémoire partagée.
+    Les départs s'arrêtent lorsque time_budget (en secondes) est épuisé.
+    Retourne le triplet (coût, tournée, coûts des départs effectués).
+    """
+    deadline = None if time_budget is None else time.time() + time_budget
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    tour = CONSTRUCTIONS[construction](instance.coords)
+    graines = np.random.SeedSequence(graine).spawn(n_departs)
+
+    if n_jobs > 1 and n_departs > 1:
+        points = np.ascontiguousarray(instance.coords, dtype=np.int32)
+        shm, partage = create_shared_array(points.shape, points.dtype)
+        partage[...] = points
+        del partage
+        try:
+            with ProcessPoolExecutor(max_workers=min(n_jobs, n_departs), initializer=_init_worker,
+                                     initargs=(shm.name, points.shape, points.dtype, k_voisins)) as pool:
+                futures = [pool.submit(_depart_worker, tour, strategie, g, mouvements, iterations, deadline)
+                           for g in graines]
+                resultats = [f.result() for f in futures]
+        finally:
+            shm.close()
+            shm.unlink()
+    else:
+        voisins = listes_voisins(instance.coords, k_voisins)
+        resultats = [depart(tour, instance, voisins, strategie, g, mouvements, iterations, deadline)
+                     for g in graines]
+
+    resultats = [r for r in resultats if r is not None]
+    if not resultats:
+        # Budget épuisé avant le premier départ: tournée construite
+        return evaluate_solution(tour, instance), tour, []
+    compter("multistart", departs=len(resultats), perturbations_acceptees=sum(r[2] for r in resultats))
+    cout, meilleur, _ = min(resultats, key=lambda r: r[0])
+    return cout, meilleur, [r[0] for r in resultats]
+
+
+def distribution_couts(couts):
+    """Statistiques des coûts des départs (minimum, médiane, moyenne, maximum,
+    écart-type)."""
+    return {"departs": len(couts), "min": min(couts), "mediane": statistics.median(couts),
+            "moyenne": statistics.mean(couts), "max": max(couts),
+            "ecart_type": statistics.pstdev(couts)}
@@ -1,115 +1,240 @@
 #Idée: pour le problème delta-tsp, la méthode par programmation dynamique
-#nécessite de calculer la quantité t(X,j) (voir le poly) où j est un nombre
-#entre 1 et N mais où X est un sous-ensemble de S = {1,...,N}. Il est donc question
-#de modéliser X en Python. Ici, on fait le choix de modéliser X par une chaîne
-#de caractères T de longueur N telle que la chaîne est composée de 0 ou de 1 et
-#pour tout i dans S, i est dans X si et seulement si T[i-1] vaut 1.
-
-#Dans la définition de t(X,j), X ne contient jamais le sommet 1, par conséquent,
-#si X est modélisé par T, T[0] vaudra toujours 0. On a ceci car on suppose dans la
-#modélisation T, que chaque sommet i est associé à la position i-1 du tableau T, mais
-#rien n'empêche de réétiqueter les sommets de S. Par conséquent, on devra explicitement
-#donner l'indice dans T du sommet qui fait office de sommet 1. On nomme cet indice origin.
-#Donc si le sommet 1 est bien en première position de T, alors origin vaudra 0 et si le
-#sommet 1 est en 2ème position dans T, alors origin vaudra 1 et dans tous les cas T[origin]
-#vaudra 0.
-
-#Ensuite pour calculer t(X,j) il est nécessaire par sa formule de calculer
-#d'autres t(Y,k). Pour ce faire, on décide de procéder par programmation dynamique mêlée
-#à de la mémoisation:
-# 1) on stocke les t(Y,k) déjà calculés dans un dictionnaire D
-# 2) pour le calcul de t(X,j), chaque t(Y,k) à calculer non présent dans D (donc t(Y,k) inconnu),
-#on fait le calcul de t(Y,k) récursivement jusqu'à pouvoir trouver des valeurs connues présentes
-#dans D et pouvoir finalement calculer t(Y,k). Une fois t(X,j) calculé, on peut le mettre dans D
-#et si on est amené à recalculer t(X,j), comme il est déjà dans D, il n'est en réalité pas
-#utile de le recalculer, il suffit de le retourner.
-
-#Pour chaque t(X,j), il est également possible de lui associer un plus court chemin
-#C(X,j) de poids t(X,j) partant de 1, passant par chaque sommet de X une seule
-#fois et terminant en le sommet j, ce que l'on fera dans les fonctions qui suivent.
-
-#Pour le dictionnaire D évoqué, pour stocker t(X,j), il est assez évident que (X,j)
-#est la clé et le couple (t(X,j), C(X,j)) sera la valeur. De plus, pour modéliser
-#(X,j), on sait déjà que X est modélisé par la chaîne de caractère T évoquée plus tôt,
-#mais pour modéliser j il est assez évident que l'on devra utiliser l'indice i_j qui
-#dans la chaîne T correspond au sommet j. D'où (X,j) est modélisé par (T,i_j). 
+#nécessite de calculer la quantité t(X,j) (voir le poly) où j est un sommet
+#différent du sommet de départ (d'indice origin) et où X est un sous-ensemble
+#des autres sommets contenant j: t(X,j) est le poids d'un plus court chemin
+#partant de origin, passant une seule fois par chaque sommet de X et terminant
+#en j (algorithme de Held-Karp).
 
+#Les m = N-1 sommets autres que origin sont renumérotés 0..m-1 et un
+#sous-ensemble X est modélisé par un entier S (masque de bits): le sommet b est
+#dans X si et seulement si le bit b de S vaut 1. On a alors
+#   t({b},b) = distances[origin][b]
+#   t(S,j) = min sur k dans S\{j} de t(S\{j},k) + distances[k][j]
+#Comme S\{j} contient un élément de moins que S, on calcule les t(S,j) de
+#façon itérative, couche par couche selon le cardinal de S, et chaque couche
+#est traitée de façon vectorisée avec numpy.
 
+#Les valeurs t(S,j) sont stockées dans un tableau numpy cout de taille 2^m x m
+#(cout[S,j] vaut "l'infini" si j n'est pas dans S) et, pour reconstruire le
+#chemin, on ne stocke pas le chemin lui-même mais seulement le prédécesseur k de
+#j réalisant le minimum dans un tableau parent de taille 2^m x m (entiers sur
+#un octet). La complexité est en O(n²2ⁿ) en temps et en O(n2ⁿ) en mémoire.
 
+#Une couche ne dépend que de la couche précédente et, dans une couche, les
+#calculs pour deux sommets j différents écrivent dans des cases distinctes: on
+#peut donc répartir les sommets j d'une couche entre plusieurs processus. Les
+#tableaux cout et parent sont alors placés en mémoire partagée pour ne pas être
+#copiés d'un processus à l'autre.
 
-#------------------------------------------------------------------------------------------------
 
 
-import math
- 
-#La fonction initialise et retourne le dictionnaire D avec les valeurs de bases à connaître pour
-#faire les calculs, i.e en notant E l'ensemble vide, les valeurs de bases t(E,1), t(E,2) jusqu'à
-#t(E,N) associées respectivement à leur chemin-solution C(E,j).
-#On notera que origin en paramètre désigne bien l'indice du sommet 1 dans la modélisation de E 
-#par T qui est une chaîne de caractères de longueur nb_nodes=N et remplie de 0. distances[i,j]
-#désigne la distance entre deux sommets I et J d'indice i et j (i,j à valeurs dans 0..N-1 donc) 
-def init_storage(nb_nodes,origin,distances):
-    storage = dict()
-    empty_set = "0"*nb_nodes
-    for i in range(nb_nodes):
-        if i==origin:
-            storage[(empty_set,origin)]=(distances[origin][origin],[origin])
-        else:
-            storage[(empty_set,i)]=(distances[origin][i],[origin,i])
-    return storage
 
+#------------------------------------------------------------------------------------------------
 
-#algorithme de programmation dynamique 
-def tspProgDyn(nb_nodes,distances,key,storage,origin):
-    if key in storage:
-        return storage[key]
-    else:
-        k=key[0]
-        l=key[1]
-        
-        
-        min_distance=math.inf
-        set_minimizer= ""
-        ind_minimizer=None
-
-        for j in range(nb_nodes):
-            if j==origin:
-                continue
-            if k[j] == '1':
-                X_temp = k[0:j]+"0"+k[(j+1):nb_nodes]
-                dist_calc = tspProgDyn(nb_nodes,distances,(X_temp,j),storage,origin)[0] + distances[j][l]
-                if dist_calc < min_distance:
-                    min_distance=dist_calc
-                    set_minimizer=X_temp
-                    ind_minimizer=j
-
-        storage[key]=(min_distance,storage[(set_minimizer,ind_minimizer)][1]+[l])
-        return storage[key]
-
-
-#construire la modélisation de l'ensemble des sommets
-#privé du sommet d'indice origin
-def solution_set(nb_nodes,origin):
-    part1 = "1"*origin
-    part2 = "1"*(nb_nodes-origin-1)
-    return part1+"0"+part2
+
+import os
+import time
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils import create_shared_array, attach_shared_array, distance_matrix
+from instrumentation import compter
+
+
+#choisit le type des tableaux de la programmation dynamique: des entiers sur
+#32 bits lorsque les distances sont entières et qu'aucun chemin ne peut dépasser
+#la valeur sentinelle qui joue le rôle de l'infini, des flottants sinon
+def table_dtype(M):
+    if np.issubdtype(M.dtype, np.integer) and int(np.abs(M).max(initial=0)) * len(M) < 2**30:
+        return np.int32, 2**30
+    return np.float64, np.inf
+
+
+#partition des masques 0..2^m-1 selon leur nombre de bits à 1: couches[c]
+#contient les masques de cardinal c
+def layers_by_size(m):
+    masks = np.arange(1 << m, dtype=np.int64)
+    size = np.zeros(1 << m, dtype=np.int8)
+    for b in range(m):
+        size += ((masks >> b) & 1).astype(np.int8)
+    ordre = np.argsort(size, kind="stable")
+    bornes = np.searchsorted(size[ordre], np.arange(m + 2))
+    return [ordre[bornes[c]:bornes[c + 1]] for c in range(m + 1)]
+
+
+#calcule la couche des masques 'layer' à partir de la couche précédente pour
+#chaque sommet j de js (par défaut tous): cout[S,j] = min_k cout[S^(1<<j),k] + M[k,j]
+def compute_layer(layer, cout, parent, M_autres, m, js=None):
+    for j in (range(m) if js is None else js):
+        sel = layer[(layer >> j) & 1 == 1]
+        if len(sel) == 0:
+            continue
+        cand = cout[sel ^ (1 << j)] + M_autres[:, j]
+        k = np.argmin(cand, axis=1)
+        cout[sel, j] = cand[np.arange(len(sel)), k]
+        parent[sel, j] = k
+
+
+#état d'un processus fils: tableaux partagés attachés et couches de masques
+_worker = {}
+
+
+def _init_worker(noms, m, dtype, M_autres):
+    shm_cout, cout = attach_shared_array(noms[0], (1 << m, m), dtype)
+    shm_parent, parent = attach_shared_array(noms[1], (1 << m, m), np.int8)
+    _worker.update(segments=(shm_cout, shm_parent), cout=cout, parent=parent,
+                   M_autres=M_autres, m=m, couches=layers_by_size(m))
+
+
+def _compute_layer_part(c, js):
+    w = _worker
+    compute_layer(w["couches"][c], w["cout"], w["parent"], w["M_autres"], w["m"], js)
+
+
+#calcule toutes les couches en répartissant les sommets j de chaque couche
+#entre n_jobs processus; cout et parent sont des arrays partagés dont les
+#segments ont pour noms 'noms'; retourne False si deadline est dépassée
+def compute_layers_parallel(noms, cout, M_autres, m, n_jobs, temps_couches, deadline=None):
+    parts = [list(range(r, m, n_jobs)) for r in range(min(n_jobs, m))]
+    with ProcessPoolExecutor(max_workers=len(parts), initializer=_init_worker,
+                             initargs=(noms, m, cout.dtype, M_autres)) as pool:
+        for c in range(2, m + 1):
+            if deadline is not None and time.time() >= deadline:
+                return False
+            debut = time.perf_counter()
+            for f in [pool.submit(_compute_layer_part, c, js) for js in parts]:
+                f.result()
+            if temps_couches is not None:
+                temps_couches.append((c, time.perf_counter() - debut))
+    return True
+
+
+#remonte les prédécesseurs depuis le sommet j du masque complet et retourne le
+#chemin (sommets de autres) dans l'ordre de parcours
+def rebuild_path(parent, autres, j):
+    chemin = []
+    S = (1 << len(autres)) - 1
+    while S:
+        chemin.append(autres[j])
+        k = int(parent[S, j])
+        S ^= 1 << j
+        j = k
+    chemin.reverse()
+    return chemin
+
+
+#reconstruit le cycle optimal à partir des tableaux de la programmation dynamique
+def rebuild_cycle(cout, parent, M, autres, origin):
+    full = (1 << len(autres)) - 1
+    fin = cout[full] + M[autres, origin]
+    j = int(np.argmin(fin))
+    return fin[j], [origin] + rebuild_path(parent, autres, j) + [origin]
+
+
+#couches de masques des petits problèmes, conservées d'un appel à l'autre
+@lru_cache(maxsize=32)
+def _couches_chemin(m):
+    return layers_by_size(m)
+
+
+#calcule un plus court chemin hamiltonien allant du sommet debut au sommet fin
+#de la matrice M (array numpy) en passant une seule fois par chacun des autres
+#sommets: même récurrence que tspPrDy avec t({b},b) = M[debut][b], la fermeture
+#se faisant vers fin au lieu de l'origine. Retourne un couple (p,c) où p est le
+#poids du chemin et c le chemin (liste d'indices de M, de debut à fin).
+#Réservé aux petits problèmes (fenêtres de fenetres.py).
+def chemin_prdy(M, debut, fin):
+    M = np.asarray(M)
+    autres = [i for i in range(len(M)) if i != debut and i != fin]
+    m = len(autres)
+    if m == 0:
+        return M[debut, fin], [debut, fin]
+    dtype, infini = table_dtype(M)
+    M_autres = M[np.ix_(autres, autres)].astype(dtype)
+    cout = np.full((1 << m, m), infini, dtype=dtype)
+    parent = np.zeros((1 << m, m), dtype=np.int8)
+    for b in range(m):
+        cout[1 << b, b] = M[debut, autres[b]]
+    couches = _couches_chemin(m)
+    for c in range(2, m + 1):
+        compute_layer(couches[c], cout, parent, M_autres, m)
+    dernier = cout[(1 << m) - 1] + M[autres, fin]
+    j = int(np.argmin(dernier))
+    return dernier[j], [debut] + rebuild_path(parent, autres, j) + [fin]
 
 
 #calcule d'un plus court cycle hamiltonien partant du sommet d'indice origin
 #et retourne un couple (p,c) où p est le poids du plus court cycle et c est un
 #plus court cycle décrit par une liste.
-def tspPrDy(distances,origin):
-    nb_nodes=len(distances)
-    D=init_storage(nb_nodes,origin,distances)
-    key=(solution_set(nb_nodes,origin),origin)
-    return tspProgDyn(nb_nodes,distances,key,D,origin)
+#n_jobs est le nombre de processus utilisés (None: tous les cœurs) et si
+#temps_couches est une liste, on y ajoute pour chaque couche le couple
+#(cardinal, temps de calcul en secondes).
+#si deadline (date en secondes, voir time.time) est dépassée avant la fin du
+#calcul, la fonction retourne None.
+def tspPrDy(distances,origin,n_jobs=1,temps_couches=None,deadline=None):
+    M = distance_matrix(distances)
+    nb_nodes = len(M)
+    autres = [i for i in range(nb_nodes) if i != origin]
+    m = len(autres)
+    if m == 0:
+        return M[origin][origin], [origin]
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    parallele = n_jobs > 1 and m > 2
+
+    dtype, infini = table_dtype(M)
+    # Taille de la table de mémoïsation t(S,j) (et de la table des prédécesseurs)
+    compter("progdyn", appels=1, entrees_memo=(1 << m) * m)
+    M_autres = M[np.ix_(autres, autres)].astype(dtype)
+    if parallele:
+        # Tableaux en mémoire partagée, attachés par les processus fils
+        segments = (create_shared_array((1 << m, m), dtype, fill=infini),
+                    create_shared_array((1 << m, m), np.int8, fill=0))
+        (shm_cout, cout), (shm_parent, parent) = segments
+    else:
+        cout = np.full((1 << m, m), infini, dtype=dtype)
+        parent = np.zeros((1 << m, m), dtype=np.int8)
+
+    try:
+        # Couche de cardinal 1: t({b},b) = distances[origin][b]
+        for b in range(m):
+            cout[1 << b, b] = M[origin, autres[b]]
+
+        if parallele:
+            termine = compute_layers_parallel((shm_cout.name, shm_parent.name), cout,
+                                              M_autres, m, n_jobs, temps_couches, deadline)
+        else:
+            termine = True
+            couches = layers_by_size(m)
+            for c in range(2, m + 1):
+                if deadline is not None and time.time() >= deadline:
+                    termine = False
+                    break
+                debut = time.perf_counter()
+                compute_layer(couches[c], cout, parent, M_autres, m)
+                if temps_couches is not None:
+                    temps_couches.append((c, time.perf_counter() - debut))
+
+        if termine:
+            poids, cycle = rebuild_cycle(cout, parent, M, autres, origin)
+    finally:
+        if parallele:
+            del cout, parent, segments
+            for shm in (shm_cout, shm_parent):
+                shm.close()
+                shm.unlink()
+    if not termine:
+        return None
+    poids = int(poids) if np.issubdtype(M.dtype, np.integer) else float(poids)
+    return poids, cycle
 
 
 
 #-----------------------------------------------------------------------------------------
 
 
-#test de l'algorithme tspPrDy sur un petit graphe complet 
+#test de l'algorithme tspPrDy sur un petit graphe complet
 
 
 if __name__ == "__main__":
@@ -1,44 +1,438 @@
-from utils import  evaluate_solution
+import time
+from collections import deque
+import numpy as np
+from scipy.spatial import cKDTree
+from utils import manhattan_matrix
+from construct import tournee_initiale
+from instrumentation import compter
 
-def recherche_locale(tour, dist):
+
+def sous_matrice(noeuds, dist):
     """
-    Optimise une tournée en utilisant la recherche locale.
+    Extrait la matrice (liste de listes) des distances entre les sommets de
+    'noeuds', indexée localement par leur position dans 'noeuds'.
+    Les accès d[a][b] sur des listes Python sont bien plus rapides que les
+    accès dist[(i, j)] dans les boucles de la recherche locale.
+    """
+    if hasattr(dist, "D"):
+        idx = np.asarray(noeuds)
+        return dist.D[np.ix_(idx, idx)].tolist()
+    if hasattr(dist, "coords"):
+        # Sans matrice (LazyInstance): calcul vectorisé sur les coordonnées
+        return manhattan_matrix(np.asarray(dist.coords)[np.asarray(noeuds)]).tolist()
+    return [[dist[(i, j)] for j in noeuds] for i in noeuds]
+
+
+def listes_voisins(coords, k=10, noeuds=None):
+    """
+    Construit, une fois par instance, la liste des k plus proches voisins
+    (distance de Manhattan) de chaque sommet à l'aide d'un k-d tree sur les
+    coordonnées. Si 'noeuds' est donné, seuls ces sommets sont indexés.
+    Retourne un dictionnaire sommet -> liste de voisins triés par distance
+    croissante.
+    """
+    if noeuds is None:
+        noeuds = range(len(coords))
+    noeuds = list(noeuds)
+    points = np.array([coords[i] for i in noeuds], dtype=np.int64)
+    k = min(k, len(noeuds) - 1)
+    if k <= 0:
+        return {i: [] for i in noeuds}
+    _, idx = cKDTree(points).query(points, k=k + 1, p=1)
+    return {noeuds[p]: [noeuds[q] for q in ligne if q != p][:k]
+            for p, ligne in enumerate(idx.tolist())}
+
+
+def fonction_distance(noeuds, dist):
+    """
+    Retourne une fonction d(a, b) sur les indices locaux de 'noeuds' qui ne
+    nécessite pas de matrice: si dist connaît les coordonnées (Instance), la
+    distance de Manhattan est recalculée à la volée.
+    """
+    if hasattr(dist, "coords"):
+        X = [int(dist.coords[i][0]) for i in noeuds]
+        Y = [int(dist.coords[i][1]) for i in noeuds]
+        return lambda a, b: abs(X[a] - X[b]) + abs(Y[a] - Y[b])
+    return lambda a, b: dist[(noeuds[a], noeuds[b])]
+
+
+def preparer_candidats(noeuds, dist, voisins=None, k=None):
+    """
+    Prépare, pour les sommets de 'noeuds', une fonction de distance d(a, b) et
+    les listes de voisins candidats en indices locaux.
+    Sans listes de voisins, les candidats de chaque sommet sont les k (tous si
+    k vaut None) autres sommets les plus proches, obtenus par un k-d tree si
+    dist connaît les coordonnées et k est donné, par tri de la matrice sinon.
+    """
+    if voisins is None and k is not None and hasattr(dist, "coords"):
+        voisins = listes_voisins(dist.coords, k, noeuds)
+    if voisins is None:
+        M = sous_matrice(noeuds, dist)
+        ordre = np.argsort(np.asarray(M), axis=1, kind="stable").tolist()
+        voisins_locaux = [[b for b in ligne if b != a][:k] for a, ligne in enumerate(ordre)]
+        return (lambda a, b: M[a][b]), voisins_locaux
+    # Voisins candidats restreints aux sommets de la tournée, en indices locaux
+    indice = {v: i for i, v in enumerate(noeuds)}
+    voisins_locaux = [[indice[w] for w in voisins[v] if w in indice]
+                      for v in noeuds]
+    return fonction_distance(noeuds, dist), voisins_locaux
+
+
+def inverser(tour, pos, i, j):
+    """
+    Inverse sur place le segment cyclique tour[i..j] en tenant à jour les
+    positions 'pos'. Pour une distance symétrique, inverser le segment
+    complémentaire donne le même cycle: on inverse donc le plus court des deux.
+    """
+    m = len(tour)
+    longueur = (j - i) % m + 1
+    if 2 * longueur > m:
+        i, j = (j + 1) % m, (i - 1) % m
+        longueur = m - longueur
+    if longueur < 2:
+        return
+    if i + longueur <= m:
+        # Segment contigu: inversion par tranche
+        tour[i:i + longueur] = tour[i + longueur - 1:i - 1 if i else None:-1]
+        for p in range(i, i + longueur):
+            pos[tour[p]] = p
+        return
+    for _ in range(longueur // 2):
+        a, b = tour[i], tour[j]
+        tour[i], pos[b] = b, i
+        tour[j], pos[a] = a, j
+        i = (i + 1) % m
+        j = (j - 1) % m
+
+
+def entre(pos, m, a, b, c):
+    """Indique si b se trouve sur le chemin allant de a à c dans le sens du cycle."""
+    pa = pos[a]
+    return (pos[b] - pa) % m <= (pos[c] - pa) % m
+
+
+def deplacer_segment(tour, pos, i, j, k, inverse=False):
+    """
+    Déplace le segment cyclique tour[i..j] (éventuellement inversé) entre
+    tour[k] et son successeur, k étant hors du segment. Selon le côté le plus
+    court, ce sont les sommets situés entre le segment et k qui reculent, ou
+    ceux situés de l'autre côté qui avancent.
+    """
+    m = len(tour)
+    longueur = (j - i) % m + 1
+    segment = [tour[(i + t) % m] for t in range(longueur)]
+    if inverse:
+        segment.reverse()
+    milieu = (k - j) % m
+    autre = m - longueur - milieu
+    if milieu <= autre:
+        for t in range(milieu):
+            v = tour[(j + 1 + t) % m]
+            p = (i + t) % m
+            tour[p], pos[v] = v, p
+        debut = (i + milieu) % m
+    else:
+        for t in range(autre - 1, -1, -1):
+            v = tour[(k + 1 + t) % m]
+            p = (k + 1 + t + longueur) % m
+            tour[p], pos[v] = v, p
+        debut = (k + 1) % m
+    for t, v in enumerate(segment):
+        p = (debut + t) % m
+        tour[p], pos[v] = v, p
+
+
+#Chaque mouvement examine les mouvements améliorants autour du sommet a et
+#applique le meilleur d'entre eux. Il retourne le couple (delta, sommets
+#touchés) si un mouvement a été appliqué, None sinon.
+
+def mouvement_2opt(tour, pos, d, voisins, a):
+    """2-opt: remplace deux arêtes par deux autres en inversant un segment."""
+    m = len(tour)
+    for sens in (1, -1):
+        # sens = 1: arête (a, succ(a)), sens = -1: arête (pred(a), a).
+        # On retient le meilleur mouvement parmi les voisins de a.
+        b = tour[(pos[a] + sens) % m]
+        d_ab = d(a, b)
+        meilleur = None
+        for c in voisins[a]:
+            d_ac = d(a, c)
+            if d_ac >= d_ab:
+                break
+            e = tour[(pos[c] + sens) % m]
+            if c == b or e == a:
+                continue
+            delta = d_ac + d(b, e) - d_ab - d(c, e)
+            if delta < 0 and (meilleur is None or delta < meilleur[0]):
+                meilleur = (delta, c, e)
+        if meilleur is not None:
+            delta, c, e = meilleur
+            if sens == 1:
+                # a b ... c e  ->  a c ... b e
+                inverser(tour, pos, pos[b], pos[c])
+            else:
+                # e c ... b a  ->  e b ... c a
+                inverser(tour, pos, pos[c], pos[b])
+            return delta, (a, b, c, e)
+    return None
+
+
+def mouvement_oropt(tour, pos, d, voisins, a, longueurs=(1, 2, 3)):
+    """
+    Or-opt: déplace le segment de 1 à 3 sommets commençant en a entre deux
+    sommets consécutifs c et e, l'une de ses extrémités devenant voisine de c.
+    """
+    m = len(tour)
+    i = pos[a]
+    meilleur = None
+    for L in longueurs:
+        if L + 3 > m:
+            break
+        p = tour[(i - 1) % m]
+        y = tour[(i + L - 1) % m]
+        n = tour[(i + L) % m]
+        retrait = d(p, a) + d(y, n) - d(p, n)
+        if retrait <= 0:
+            continue
+        for x, z in ((a, y), (y, a)):
+            for c in voisins[x]:
+                d_xc = d(x, c)
+                if d_xc >= retrait:
+                    break
+                if (pos[c] - i) % m < L:
+                    continue
+                for sens in (1, -1):
+                    e = tour[(pos[c] + sens) % m]
+                    if (pos[e] - i) % m < L:
+                        continue
+                    delta = d_xc + d(z, e) - d(c, e) - retrait
+                    if delta < 0 and (meilleur is None or delta < meilleur[0]):
+                        meilleur = (delta, L, x, c, e, sens)
+            if L == 1:
+                break
+    if meilleur is None:
+        return None
+    delta, L, x, c, e, sens = meilleur
+    p = tour[(i - 1) % m]
+    y = tour[(i + L - 1) % m]
+    n = tour[(i + L) % m]
+    if sens == 1:
+        # c x ... z e
+        deplacer_segment(tour, pos, i, (i + L - 1) % m, pos[c], inverse=(x != a))
+    else:
+        # e z ... x c
+        deplacer_segment(tour, pos, i, (i + L - 1) % m, pos[e], inverse=(x == a))
+    return delta, (p, n, a, y, c, e)
+
+
+def mouvement_3opt(tour, pos, d, voisins, a):
+    """
+    3-opt restreint ("or3opt"): déplacement de segment sans inversion
+    a b..c d..e f -> a d..e b..c f, construit séquentiellement à partir des
+    voisins candidats de a puis de c avec un gain partiel toujours positif.
     """
-    nb_clients = len(tour) - 1  # -1 car la tournée inclut le dépôt
+    m = len(tour)
+    if m < 6:
+        return None
+    b = tour[(pos[a] + 1) % m]
+    g0 = d(a, b)
+    meilleur = None
+    for s in voisins[a]:
+        g1 = g0 - d(a, s)
+        if g1 <= 0:
+            break
+        if s == b:
+            continue
+        c = tour[(pos[s] - 1) % m]
+        g1 += d(c, s)
+        for f in voisins[c]:
+            g2 = g1 - d(c, f)
+            if g2 <= 0:
+                break
+            if f == s or not entre(pos, m, s, f, a):
+                continue
+            e = tour[(pos[f] - 1) % m]
+            gain = g2 + d(e, f) - d(e, b)
+            if gain > 0 and (meilleur is None or gain > meilleur[0]):
+                meilleur = (gain, c, s, e, f)
+    if meilleur is None:
+        return None
+    gain, c, s, e, f = meilleur
+    # On déplace le plus court des deux segments b..c et s..e
+    if (pos[c] - pos[b]) % m <= (pos[e] - pos[s]) % m:
+        deplacer_segment(tour, pos, pos[b], pos[c], pos[e])
+    else:
+        deplacer_segment(tour, pos, pos[s], pos[e], pos[a])
+    return -gain, (a, b, c, s, e, f)
+
+
+MOUVEMENTS = {
+    "2opt": mouvement_2opt,
+    "oropt": mouvement_oropt,
+    "3opt": mouvement_3opt,
+}
+
+
+def recherche_voisins(tour, d, voisins, mouvements=("2opt",), deadline=None):
+    """
+    Recherche locale restreinte aux listes de voisins candidats avec
+    "don't-look bits": seuls les sommets dont une arête a changé sont
+    réexaminés. 'tour' est un cycle (non fermé) d'indices locaux modifié sur
+    place, d(a, b) une fonction de distance et voisins[a] la liste des voisins
+    locaux de a triés par distance croissante. 'mouvements' liste les noms
+    (clés de MOUVEMENTS) ou fonctions des mouvements essayés dans l'ordre.
+    Un passage coûte O(n.k) au lieu de O(n²).
+    Si deadline (date en secondes, voir time.time) est dépassée, la recherche
+    s'arrête en laissant une tournée valide.
+    Retourne la variation totale du coût (négative ou nulle).
+    """
+    m = len(tour)
+    if m < 4:
+        return 0
+    mouvements = [MOUVEMENTS[mv] if isinstance(mv, str) else mv for mv in mouvements]
+    pos = [0] * m
+    for p, a in enumerate(tour):
+        pos[a] = p
+    actifs = deque(tour)
+    en_attente = [True] * m
+    delta_total = 0
+    compteur = 0
+    appliques = 0
+    non_evalues = 0
+
+    while actifs:
+        if deadline is not None and compteur % 256 == 255 and time.time() >= deadline:
+            break
+        compteur += 1
+        a = actifs.popleft()
+        en_attente[a] = False
+        for mouvement in mouvements:
+            resultat = mouvement(tour, pos, d, voisins, a)
+            if resultat is not None:
+                delta, touches = resultat
+                delta_total += delta
+                for v in touches:
+                    if not en_attente[v]:
+                        en_attente[v] = True
+                        actifs.append(v)
+                appliques += 1
+                non_evalues += len(mouvements) - 1 - mouvements.index(mouvement)
+                break
+    # Un passage correspond à l'examen de m sommets
+    compter("rech_loc", sommets_examines=compteur, passages=-(-compteur // m),
+            mouvements_evalues=compteur * len(mouvements) - non_evalues,
+            mouvements_appliques=appliques)
+    return delta_total
+
+
+def deux_opt(tour, d, deadline=None):
+    """
+    Applique la recherche locale 2-opt sur 'tour' (liste d'indices locaux,
+    fermée: tour[0] == tour[-1]) avec la matrice d.
+    Le gain d'un mouvement est calculé à partir des 4 arêtes modifiées
+    uniquement (distance symétrique) et le segment est inversé sur place
+    lorsque le mouvement est accepté.
+    Si deadline (date en secondes, voir time.time) est dépassée, la recherche
+    s'arrête en laissant une tournée valide.
+    Retourne la variation totale du coût (négative ou nulle).
+    """
+    m = len(tour) - 1
+    delta_total = 0
+    passages = evalues = appliques = 0
     amelioration = True
-    iteration = 0
-    
+    while amelioration:
+        amelioration = False
+        passages += 1
+        for i in range(1, m - 1):
+            if deadline is not None and time.time() >= deadline:
+                amelioration = False
+                break
+            evalues += m - 1 - i
+            # Arête (a, b) retirée: a = tour[i-1], b = tour[i]
+            d_a = d[tour[i - 1]]
+            b = tour[i]
+            d_b = d[b]
+            d_ab = d_a[b]
+            for j in range(i + 1, m):
+                # Arête (c, e) retirée: c = tour[j], e = tour[j+1]
+                c, e = tour[j], tour[j + 1]
+                delta = d_a[c] + d_b[e] - d_ab - d[c][e]
+                if delta < 0:
+                    # Inversion du segment tour[i..j] sur place
+                    tour[i:j + 1] = tour[j:i - 1:-1]
+                    delta_total += delta
+                    amelioration = True
+                    appliques += 1
+                    b = tour[i]
+                    d_b = d[b]
+                    d_ab = d_a[b]
+    compter("rech_loc", passages=passages, mouvements_evalues=evalues, mouvements_appliques=appliques)
+    return delta_total
+
+
+def normaliser_tournee(tour, depot=0):
+    """
+    Retourne la tournée sous forme d'une liste non fermée commençant par le
+    dépôt.
+    """
+    # Retirer la fermeture éventuelle de la tournée
+    if len(tour) > 1 and tour[0] == tour[-1]:
+        tour = tour[:-1]
+
     # S'assurer que le premier élément est le dépôt (indice 0)
-    if tour[0] != 0:
+    if tour[0] != depot:
         # Trouver la position du dépôt
-        depot_pos = tour.index(0)
+        depot_pos = tour.index(depot)
         # Réorganiser la tournée pour qu'elle commence par le dépôt
         tour = tour[depot_pos:] + tour[:depot_pos]
-    
-    cout_actuel = evaluate_solution(tour, dist)
-    
-    while amelioration:
-        amelioration = False
-        for i in range(1, len(tour) - 1):  # Exclure le dépôt au début et à la fin
-            for j in range(i+1, len(tour) - 1):  # Exclure le dépôt à la fin
-                # Créer une nouvelle tournée en inversant la séquence entre i et j
-                nouvelle_tour = tour[:i] + tour[i:j+1][::-1] + tour[j+1:]
-                nouveau_cout = evaluate_solution(nouvelle_tour, dist)
-                
-                # Si la nouvelle tournée est meilleure, l'adopter
-                if nouveau_cout < cout_actuel:
-                    tour = nouvelle_tour
-                    cout_actuel = nouveau_cout
-                    amelioration = True
-                    iteration += 1
-                    break
-            
-            if amelioration:
-                break
-    
-    # Assurer que la tournée se termine par le dépôt si ce n'est pas déjà le cas
-    if tour[0] != tour[-1]:
-        tour.append(tour[0])
-    
-    return tour
+    return list(tour)
+
+
+def cycle_vers_tournee(cycle, noeuds):
+    """
+    Convertit un cycle d'indices locaux (l'indice 0 désignant le dépôt) en une
+    tournée de sommets de 'noeuds' partant du dépôt et s'y terminant.
+    """
+    p = cycle.index(0)
+    return [noeuds[k] for k in cycle[p:] + cycle[:p]] + [noeuds[0]]
+
+
+#Sans matrice des distances, taille de tournée au-delà de laquelle la recherche
+#locale n'extrait plus de sous-matrice (O(m²) en mémoire) mais utilise les
+#K_VOISINS_DEFAUT plus proches voisins
+SEUIL_MATRICE = 2000
+K_VOISINS_DEFAUT = 10
+
+
+def recherche_locale(tour, dist, voisins=None, mouvements=("2opt",), construction=None, deadline=None):
+    """
+    Optimise une tournée en utilisant la recherche locale.
+    Si 'voisins' (voir listes_voisins) est fourni, seuls les mouvements vers
+    les voisins candidats sont examinés, avec des "don't-look bits".
+    'mouvements' choisit les mouvements utilisés parmi "2opt", "oropt" et
+    "3opt" (voir MOUVEMENTS).
+    Si 'construction' est donné ("ppv", "glouton", "hilbert", voir
+    construct.CONSTRUCTIONS), la recherche part de la tournée construite sur
+    les mêmes sommets à partir des coordonnées de dist au lieu de 'tour'.
+    La recherche s'arrête à la date deadline (voir time.time) si elle est donnée.
+    Si dist n'a pas de matrice des distances (LazyInstance) et que la tournée
+    compte plus de SEUIL_MATRICE sommets, la recherche est restreinte aux
+    K_VOISINS_DEFAUT plus proches voisins pour ne pas construire de matrice.
+    """
+    noeuds = normaliser_tournee(tour)
+    if construction is not None:
+        noeuds = normaliser_tournee(tournee_initiale(noeuds, dist.coords, construction))
+    if voisins is None and not hasattr(dist, "D") and hasattr(dist, "coords") and len(noeuds) > SEUIL_MATRICE:
+        voisins = listes_voisins(dist.coords, K_VOISINS_DEFAUT, noeuds)
+    if voisins is None and tuple(mouvements) == ("2opt",):
+        # Travail sur des indices locaux 0..m-1 et une matrice extraite une seule fois
+        d = sous_matrice(noeuds, dist)
+        local = list(range(len(noeuds))) + [0]
+        deux_opt(local, d, deadline)
+        # La tournée se termine par le dépôt
+        return [noeuds[k] for k in local]
 
+    d, voisins_locaux = preparer_candidats(noeuds, dist, voisins)
+    local = list(range(len(noeuds)))
+    recherche_voisins(local, d, voisins_locaux, mouvements, deadline)
+    return cycle_vers_tournee(local, noeuds)
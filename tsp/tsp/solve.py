@@ -0,0 +1,165 @@
+import time
+from utils import evaluate_solution, generate_dense_instance
+from construct import CONSTRUCTIONS
+from approx import solve_tsp_2approx, solve_tsp_christofides
+from rech_loc import recherche_locale, listes_voisins
+from lk import lin_kernighan
+from progdyn import tspPrDy
+from ilp import tsp_ilp_solver
+from fenetres import reoptimiser_fenetres
+from branch_bound import tsp_branch_bound, TAILLE_MAX
+from instrumentation import phase, activer, desactiver
+
+##Point d'entrée commun, avec budget de temps, pour les méthodes du package
+
+#solve enchaîne trois étapes: construction d'une tournée, amélioration
+#(recherche locale ou Lin-Kernighan) puis, pour les petites instances, méthode
+#exacte. Chaque tournée meilleure que la précédente devient la solution
+#courante (signalée par le callback); lorsque le budget est épuisé, les
+#méthodes s'arrêtent et la solution courante est retournée.
+
+#Méthodes de construction et d'amélioration disponibles
+CONSTRUCTION = dict(CONSTRUCTIONS, **{
+    "2approx": lambda coords, noeuds=None: solve_tsp_2approx(coords),
+    "christofides": lambda coords, noeuds=None: solve_tsp_christofides(coords),
+})
+AMELIORATION = ("rech_loc", "lk")
+EXACTE = ("progdyn", "branch_bound", "ilp", "fenetres")
+
+#Le temps de la programmation dynamique pour m sommets hors dépôt est estimé
+#proportionnel à son nombre d'opérations m² 2^m. Le temps d'une opération
+#(en secondes) dépend de la machine: s'il n'est pas fixé, il est mesuré une
+#fois par processus, à la première estimation, sur une instance de
+#TAILLE_CALIBRATION sommets (quelques centièmes de seconde)
+TEMPS_OPERATION_PROGDYN = None
+TAILLE_CALIBRATION = 16
+#Au-delà de ce nombre de sommets, les tableaux de la programmation dynamique
+#ne tiennent pas en mémoire
+MAX_PROGDYN = 23
+
+
+def _operations_progdyn(n):
+    m = n - 1
+    return m * m * 2**m
+
+
+def _calibrer_progdyn():
+    """Mesure le temps d'une opération de la programmation dynamique, hors
+    instrumentation (la calibration n'est pas comptée parmi les appels)."""
+    instance = generate_dense_instance(TAILLE_CALIBRATION - 1, seed=0)
+    compteurs = desactiver()
+    try:
+        debut = time.perf_counter()
+        tspPrDy(instance, 0)
+        return (time.perf_counter() - debut) / _operations_progdyn(TAILLE_CALIBRATION)
+    finally:
+        if compteurs is not None:
+            activer(compteurs)
+
+
+def temps_progdyn(n):
+    """Temps estimé (en secondes) de la programmation dynamique pour n sommets."""
+    global TEMPS_OPERATION_PROGDYN
+    if TEMPS_OPERATION_PROGDYN is None:
+        TEMPS_OPERATION_PROGDYN = _calibrer_progdyn()
+    return TEMPS_OPERATION_PROGDYN * _operations_progdyn(n)
+
+
+def solve(instance, method="auto", time_budget=None, callback=None, k_voisins=10):
+    """
+    Résout le TSP sur 'instance' (Instance, voir utils.generate_dense_instance)
+    depuis le dépôt 0 avec la méthode 'method':
+      - une construction ("ppv", "glouton", "hilbert", "2approx", "christofides");
+      - une amélioration ("rech_loc", "lk"), à partir d'une construction;
+      - une méthode exacte ("progdyn", jusqu'à MAX_PROGDYN sommets,
+        "branch_bound", "ilp", ou
+        "fenetres": programmation dynamique sur des fenêtres glissantes de la
+        tournée, voir fenetres.py), à partir d'une tournée améliorée qui reste
+        la solution si le budget ne suffit pas;
+      - "auto": construction, Lin-Kernighan puis, si le budget (ou la taille de
+        l'instance quand il n'y a pas de budget) le permet, méthode exacte.
+    time_budget est le temps maximal en secondes (None: pas de limite). Chaque
+    nouvelle meilleure tournée est transmise à callback(cout, tournee, etape).
+    Lève ValueError si la méthode est inconnue, ou si c'est "progdyn" et que
+    l'instance compte plus de MAX_PROGDYN sommets.
+    Retourne le couple (coût, tournée) de la meilleure tournée trouvée.
+    """
+    n = len(instance)
+    if method != "auto" and method not in CONSTRUCTION and method not in AMELIORATION + EXACTE:
+        raise ValueError(f"Méthode inconnue: {method}")
+    if method == "progdyn" and n > MAX_PROGDYN:
+        raise ValueError(f"Programmation dynamique limitée à {MAX_PROGDYN} sommets ({n} sommets)")
+    debut = time.time()
+    deadline = None if time_budget is None else debut + time_budget
+    meilleur = [None, None]
+
+    def proposer(tournee, etape):
+        cout = evaluate_solution(tournee, instance)
+        if meilleur[0] is None or cout < meilleur[0]:
+            meilleur[:] = [cout, tournee]
+            if callback is not None:
+                callback(cout, tournee, etape)
+
+    def restant():
+        return None if deadline is None else deadline - time.time()
+
+    # 1. Construction: la plus rapide si le budget est très court
+    if method in CONSTRUCTION:
+        construction = method
+    elif time_budget is not None and time_budget < 5e-5 * n:
+        construction = "hilbert"
+    else:
+        construction = "glouton"
+    with phase("construction"):
+        tour = CONSTRUCTION[construction](instance.coords)
+    proposer(tour, construction)
+    if method == construction or (deadline is not None and restant() <= 0):
+        return tuple(meilleur)
+
+    # 2. Amélioration, si le budget restant couvre au moins la construction des
+    # listes de voisins
+    if n >= 5 and (deadline is None or restant() > 2e-5 * n):
+        with phase("amelioration"):
+            voisins = listes_voisins(instance.coords, k_voisins)
+            if method == "rech_loc":
+                tour = recherche_locale(meilleur[1], instance, voisins, ("2opt", "oropt"), deadline=deadline)
+            else:
+                tour = lin_kernighan(meilleur[1], instance, voisins, deadline=deadline)
+        proposer(tour, "rech_loc" if method == "rech_loc" else "lk")
+    if method in AMELIORATION or (deadline is not None and restant() <= 0):
+        return tuple(meilleur)
+
+    # 3. Méthode exacte: programmation dynamique si son temps estimé tient dans
+    # le budget, branch-and-bound puis ILP (DFJ) partant de la meilleure
+    # tournée pour les instances moyennes, fenêtres glissantes exactes sinon
+    if method == "auto":
+        if time_budget is None:
+            method = "progdyn" if n <= 16 else "branch_bound" if n <= TAILLE_MAX else "fenetres"
+        elif n <= MAX_PROGDYN and temps_progdyn(n) < restant():
+            method = "progdyn"
+        elif n <= TAILLE_MAX:
+            method = "branch_bound"
+        elif n <= 100 and restant() > 1:
+            method = "ilp"
+        else:
+            method = "fenetres"
+    if method == "progdyn":
+        with phase("exacte"):
+            resultat = tspPrDy(instance, 0, deadline=deadline)
+        if resultat is not None:
+            proposer(resultat[1], "progdyn")
+    elif method == "branch_bound":
+        with phase("exacte"):
+            resultat = tsp_branch_bound(0, instance, initial_tour=meilleur[1], time_limit=restant())
+        proposer(resultat[1], "branch_bound")
+    elif method == "ilp":
+        with phase("exacte"):
+            _, tour, infos = tsp_ilp_solver(0, instance, mode="dfj", initial_tour=meilleur[1],
+                                            time_limit=restant(), details=True)
+        if infos["status"] != "Not Solved":
+            proposer(tour, "ilp")
+    elif method == "fenetres":
+        with phase("exacte"):
+            tour = reoptimiser_fenetres(meilleur[1], instance, deadline=deadline)
+        proposer(tour, "fenetres")
+    return tuple(meilleur)
@@ -1,22 +1,30 @@
 import time
-from utils import generate_instance, check_solution, evaluate_solution, convert_dist_format
-from approx import solve_tsp_2approx
+import numpy as np
+from utils import generate_dense_instance, check_solution, evaluate_solution, convert_dist_format, check_solutions, evaluate_solutions
+from approx import solve_tsp_2approx, solve_tsp_christofides
 from rech_loc import recherche_locale
+from lk import lin_kernighan
 from progdyn import tspPrDy
 from ilp import tsp_ilp_solver
+from bornes import borne_held_karp, ecart_certifie
+from branch_bound import tsp_branch_bound, TAILLE_MAX
 
-def test_comparaison(n_clients):
+def test_comparaison(n_clients, construction=None):
     """
     Teste et compare les différentes approches sur une instance de taille n_clients.
+    Si 'construction' est donné ("ppv", "glouton", "hilbert"), la recherche
+    locale et Lin-Kernighan partent de la tournée construite par cette
+    heuristique au lieu de la tournée dans l'ordre des indices.
     """
     print(f"=== Test de comparaison pour {n_clients} clients ===")
     
     # Génération de l'instance
     print("\nGénération de l'instance...")
-    coords, dist = generate_instance(n_clients)
+    instance = generate_dense_instance(n_clients)
+    coords, dist = instance.coords, instance
     print(f"Instance créée avec {n_clients} clients + 1 dépôt")
     
-    # Conversion du format du dictionnaire de distances pour programmation dynamique et ILP
+    # L'instance dense est directement utilisable par la programmation dynamique et l'ILP
     new_dist = convert_dist_format(dist, n_clients + 1)  # +1 pour inclure le dépôt
     
     optimal_cost = None  # Variable pour stocker le coût optimal (sera déterminé par PD ou ILP)
@@ -24,8 +32,8 @@ def test_comparaison(n_clients):
     # 3. Programmation dynamique - On l'exécute d'abord pour connaître la solution optimale
     print("\n3. Test de la programmation dynamique...")
     # Limitation de la programmation dynamique pour des instances de petite taille
-    if n_clients > 15:
-        print("Instance trop grande pour la programmation dynamique (n > 15)")
+    if n_clients > 20:
+        print("Instance trop grande pour la programmation dynamique (n > 20)")
         pd_time = "N/A"
         pd_cost = "N/A"
         pd_valid = "N/A"
@@ -72,6 +80,42 @@ def test_comparaison(n_clients):
         print(f"Coût de la solution: {ilp_cost}")
         print(f"Tournée: {ilp_tour}")
     
+    # 7. Branch-and-bound (bornes des 1-arbres), comparé à l'ILP
+    print("\n7. Test du branch-and-bound...")
+    if n_clients + 1 > TAILLE_MAX:
+        print(f"Instance trop grande pour le branch-and-bound (n > {TAILLE_MAX - 1})")
+        bb_time = "N/A"
+        bb_cost = "N/A"
+        bb_valid = "N/A"
+        bb_tour = "N/A"
+        bb_status = "Non exécuté"
+    else:
+        start_time = time.time()
+        bb_cost, bb_tour, bb_infos = tsp_branch_bound(0, dist, details=True)
+        bb_time = time.time() - start_time
+        bb_valid = check_solution(bb_tour, n_clients)
+        bb_status = "Optimal" if bb_infos["status"] == "Optimal" else "Non optimal"
+        if optimal_cost is None and bb_status == "Optimal":
+            optimal_cost = bb_cost
+        
+        print(f"Temps d'exécution: {bb_time:.4f} secondes", end="")
+        print(f" ({bb_time - ilp_time:+.4f} par rapport à l'ILP)" if isinstance(ilp_time, float) else "")
+        print(f"Nœuds évalués: {bb_infos['nodes']}")
+        print(f"Coût de la solution: {bb_cost}")
+        print(f"Tournée: {bb_tour}")
+
+        # Distances non entières (euclidiennes, sur au plus 16 sommets pour
+        # que la programmation dynamique donne l'optimum): le coût ne doit pas
+        # être arrondi et doit rester égal à l'optimum
+        points = np.asarray(coords, dtype=np.float64)[:16]
+        M_reel = np.hypot(*(points[:, None, :] - points[None, :, :]).transpose(2, 0, 1))
+        bb_reel_cost, bb_reel_tour, bb_reel_infos = tsp_branch_bound(0, M_reel, details=True)
+        reference = tspPrDy(M_reel, 0)[0]
+        assert abs(bb_reel_cost - reference) < 1e-6 * reference, \
+            f"distances euclidiennes: branch-and-bound {bb_reel_cost} au lieu de {reference}"
+        assert abs(evaluate_solution(bb_reel_tour, M_reel) - bb_reel_cost) < 1e-6 * reference
+        print(f"Distances euclidiennes: coût {bb_reel_cost:.4f} ({bb_reel_infos['status']}), optimum {reference:.4f}")
+    
     # Si nous n'avons toujours pas de coût optimal (ni PD ni ILP n'ont pu être exécutés),
     # nous ne pourrons pas déterminer l'optimalité des heuristiques
     can_determine_optimality = optimal_cost is not None
@@ -95,6 +139,23 @@ def test_comparaison(n_clients):
         print(f"Écart avec l'optimal: {gap:.2f}%")
     print(f"Tournée: {approx_tour}")
     
+    # 6. Christofides, comparé au 2-approx (temps de construction et coût)
+    print("\n6. Test de l'algorithme de Christofides...")
+    start_time = time.time()
+    christo_tour = solve_tsp_christofides(coords, dist)
+    christo_time = time.time() - start_time
+    christo_cost = evaluate_solution(christo_tour, dist)
+    christo_valid = check_solution(christo_tour, n_clients)
+    
+    christo_status = "Optimal" if christo_cost == optimal_cost else "Non optimal"
+
+    print(f"Temps d'exécution: {christo_time:.4f} secondes ({christo_time - approx_time:+.4f} par rapport au 2-approx)")
+    print(f"Coût de la solution: {christo_cost} ({(christo_cost - approx_cost) / approx_cost * 100:+.2f}% par rapport au 2-approx)")
+    print(f"Status: {christo_status}")
+    if christo_status != "Optimal" and can_determine_optimality and optimal_cost > 0:
+        print(f"Écart avec l'optimal: {(christo_cost - optimal_cost) / optimal_cost * 100:.2f}%")
+    print(f"Tournée: {christo_tour}")
+    
     # 2. Recherche locale avec solution initiale simple
     print("\n2. Test de la recherche locale...")
     # Création d'une tournée initiale simple: dépôt -> clients dans l'ordre -> dépôt
@@ -102,7 +163,7 @@ def test_comparaison(n_clients):
     initial_cost = evaluate_solution(initial_tour, dist)
     
     start_time = time.time()
-    local_tour = recherche_locale(initial_tour.copy(), dist)
+    local_tour = recherche_locale(initial_tour.copy(), dist, construction=construction)
     local_time = time.time() - start_time
     local_cost = evaluate_solution(local_tour, dist)
     local_valid = check_solution(local_tour, n_clients)
@@ -117,6 +178,23 @@ def test_comparaison(n_clients):
         print(f"Écart avec l'optimal: {gap:.2f}%")
     print(f"Tournée: {local_tour}")
     
+    # 5. Lin-Kernighan à partir de la même solution initiale
+    print("\n5. Test de Lin-Kernighan...")
+    start_time = time.time()
+    lk_tour = lin_kernighan(initial_tour.copy(), dist, construction=construction)
+    lk_time = time.time() - start_time
+    lk_cost = evaluate_solution(lk_tour, dist)
+    lk_valid = check_solution(lk_tour, n_clients)
+    
+    lk_status = "Optimal" if lk_cost == optimal_cost else "Non optimal"
+    gap = ((lk_cost - optimal_cost) / optimal_cost) * 100 if optimal_cost > 0 else 0
+
+    print(f"Temps d'exécution: {lk_time:.4f} secondes")
+    print(f"Status: {lk_status}")
+    if lk_status != "Optimal":
+        print(f"Écart avec l'optimal: {gap:.2f}%")
+    print(f"Tournée: {lk_tour}")
+    
     # Résumé des résultats
     print("\n=== Résumé des résultats ===")
     print(f"{'Méthode':<30} | {'Coût':<10} | {'Temps (s)':<10} | {'Valide':<10} | {'Status':<15}")
@@ -132,8 +210,38 @@ def test_comparaison(n_clients):
     else:
         print(f"{'Programmation linéaire (ILP)':<30} | {ilp_cost:<10} | {ilp_time:<10} | {ilp_valid:<10} | {ilp_status:<15}")
     
+    if isinstance(bb_time, float):
+        print(f"{'Branch-and-bound':<30} | {bb_cost:<10} | {bb_time:<10.4f} | {'Oui' if bb_valid else 'Non':<10} | {bb_status:<15}")
+    else:
+        print(f"{'Branch-and-bound':<30} | {bb_cost:<10} | {bb_time:<10} | {bb_valid:<10} | {bb_status:<15}")
+    
     print(f"{'Algorithme 2-approx':<30} | {approx_cost:<10} | {approx_time:<10.4f} | {'Oui' if approx_valid else 'Non':<10} | {approx_status:<15}")
+    print(f"{'Christofides':<30} | {christo_cost:<10} | {christo_time:<10.4f} | {'Oui' if christo_valid else 'Non':<10} | {christo_status:<15}")
     print(f"{'Recherche locale':<30} | {local_cost:<10} | {local_time:<10.4f} | {'Oui' if local_valid else 'Non':<10} | {local_status:<15}")
+    print(f"{'Lin-Kernighan':<30} | {lk_cost:<10} | {lk_time:<10.4f} | {'Oui' if lk_valid else 'Non':<10} | {lk_status:<15}")
+    
+    # Vérification groupée: toutes les tournées évaluées et validées en une fois
+    tours = {"Algorithme 2-approx": approx_tour, "Christofides": christo_tour,
+             "Recherche locale": local_tour, "Lin-Kernighan": lk_tour}
+    if pd_valid != "N/A":
+        tours["Programmation dynamique"] = pd_tour
+    if ilp_valid != "N/A":
+        tours["Programmation linéaire (ILP)"] = ilp_tour
+    if bb_valid != "N/A":
+        tours["Branch-and-bound"] = bb_tour
+    couts = evaluate_solutions(list(tours.values()), dist)
+    valides = check_solutions(list(tours.values()), n_clients)
+    for (nom, tour), cout, valide in zip(tours.items(), couts, valides):
+        assert cout == evaluate_solution(tour, dist) and valide == check_solution(tour, n_clients), nom
+    print(f"\nVérification groupée: {int(valides.sum())}/{len(tours)} tournées valides, "
+          f"coûts {couts.tolist()}")
+    
+    # Borne inférieure de Held-Karp: écart certifié à l'optimum de chaque
+    # tournée, même lorsque les méthodes exactes ne sont pas exécutées
+    borne, certifiee = borne_held_karp(coords, dist, int(couts[valides].min()))
+    print(f"\nBorne inférieure de Held-Karp (1-arbres): {borne}{'' if certifiee else ' (non certifiée)'}")
+    for nom, cout in zip(tours, couts):
+        print(f"  {nom:<30} | écart certifié ≤ {ecart_certifie(cout, borne):.2f}%")
     
     # Déterminer la meilleure méthode
     best_methods = []
@@ -146,6 +254,13 @@ def test_comparaison(n_clients):
         elif approx_cost == best_cost:
             best_methods.append("Algorithme 2-approx")
     
+    if christo_valid and isinstance(christo_cost, (int, float)):
+        if christo_cost < best_cost:
+            best_cost = christo_cost
+            best_methods = ["Christofides"]
+        elif christo_cost == best_cost:
+            best_methods.append("Christofides")
+    
     if local_valid and isinstance(local_cost, (int, float)):
         if local_cost < best_cost:
             best_cost = local_cost
@@ -153,6 +268,13 @@ def test_comparaison(n_clients):
         elif local_cost == best_cost:
             best_methods.append("Recherche locale")
     
+    if lk_valid and isinstance(lk_cost, (int, float)):
+        if lk_cost < best_cost:
+            best_cost = lk_cost
+            best_methods = ["Lin-Kernighan"]
+        elif lk_cost == best_cost:
+            best_methods.append("Lin-Kernighan")
+    
     if pd_valid == True and isinstance(pd_cost, (int, float)):
         if pd_cost < best_cost:
             best_cost = pd_cost
@@ -167,14 +289,40 @@ def test_comparaison(n_clients):
         elif ilp_cost == best_cost:
             best_methods.append("Programmation linéaire (ILP)")
     
+    if bb_valid == True and isinstance(bb_cost, (int, float)):
+        if bb_cost < best_cost:
+            best_cost = bb_cost
+            best_methods = ["Branch-and-bound"]
+        elif bb_cost == best_cost:
+            best_methods.append("Branch-and-bound")
+    
+
+def test_lk_petites_tournees():
+    """
+    Régression: Lin-Kernighan doit aussi optimiser les tournées de 3 clients
+    (pour 4 sommets, un seul mouvement 2-opt suffit à atteindre l'optimum).
+    """
+    print("\n=== Lin-Kernighan sur des tournées de 3 clients ===")
+    for graine in (18, 0, 1, 2, 3):
+        instance = generate_dense_instance(3, graine)
+        lk_cost = evaluate_solution(lin_kernighan([0, 1, 2, 3, 0], instance), instance)
+        pd_cost = tspPrDy(instance, 0)[0]
+        assert lk_cost == pd_cost, f"graine {graine}: LK {lk_cost} au lieu de {pd_cost}"
+    print("Lin-Kernighan optimal sur toutes les instances")
+
 
 def main():
     # Taille de l'instance à tester - ATTENTION: utiliser de petites valeurs
     # car la programmation dynamique et l'ILP sont exponentielles
-    n_clients = 8  # Pour tester les 4 méthodes, garder n ≤ 15
+    n_clients = 8  # Pour tester les 7 méthodes, garder n ≤ 15
+    
+    # Heuristique de construction de la tournée initiale (None: ordre des indices)
+    construction = "ppv"
     
     # Lancer le test de comparaison
-    test_comparaison(n_clients)
+    test_comparaison(n_clients, construction)
+
+    test_lk_petites_tournees()
     
 
 if __name__ == "__main__":
@@ -1,4 +1,7 @@
 import random
+from functools import lru_cache
+from multiprocessing import shared_memory
+import numpy as np
 
 def generate_instance(n):
     """
@@ -30,6 +33,179 @@ def generate_instance(n):
                 dist[(i, j)] = abs(x2 - x1) + abs(y2 - y1)
     return coords, dist
 
+
+class Instance:
+    """
+    Instance TSP dense: les coordonnées sont stockées dans un array int32 de
+    taille (n+1) x 2 (le centre en ligne 0) et les distances de Manhattan dans
+    une matrice D calculée en une seule opération vectorisée.
+    L'instance s'utilise comme le dictionnaire de distances (inst[(i, j)]) et
+    comme la matrice des distances (inst[i][j], len(inst)), elle peut donc être
+    passée directement à recherche_locale, solve_tsp_2approx, tspPrDy et
+    tsp_ilp_solver.
+    """
+
+    def __init__(self, coords):
+        self.coords = np.ascontiguousarray(coords, dtype=np.int32).reshape(-1, 2)
+        self.D = manhattan_matrix(self.coords)
+
+    @property
+    def n(self):
+        """Nombre de clients (le centre n'est pas compté)."""
+        return len(self.coords) - 1
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __getitem__(self, key):
+        # inst[(i, j)] -> distance sous forme d'entier Python (pas de débordement
+        # int32 lors des sommes), inst[i] -> ligne i de la matrice D
+        if isinstance(key, tuple):
+            return int(self.D[key])
+        return self.D[key]
+
+    def dist_many(self, i, js):
+        """Distances du sommet i aux sommets js (array int64)."""
+        return self.D[i, js].astype(np.int64)
+
+    def keys(self):
+        return range(len(self.coords))
+
+
+class LazyInstance:
+    """
+    Instance TSP sans matrice des distances: seules les coordonnées sont
+    stockées (array int32 de taille (n+1) x 2, éventuellement projeté en
+    mémoire, voir fichiers.charger_coords) et les distances de Manhattan sont
+    calculées à la demande. La mémoire est en O(n) au lieu de O(n²).
+    L'instance s'utilise comme Instance (inst[(i, j)], inst[i], len(inst),
+    coords) avec evaluate_solution, recherche_locale, lin_kernighan et
+    solve_tsp_2approx. Si cache est un entier, les cache dernières distances
+    demandées par inst[(i, j)] sont conservées (cache LRU).
+    """
+
+    def __init__(self, coords, cache=None):
+        self.coords = np.asarray(coords)
+        if self.coords.dtype != np.int32 or self.coords.ndim != 2:
+            self.coords = np.ascontiguousarray(coords, dtype=np.int32).reshape(-1, 2)
+        # Coordonnées en listes Python: plus rapides que l'array pour les accès unitaires
+        X = self.coords[:, 0].tolist()
+        Y = self.coords[:, 1].tolist()
+
+        def distance(i, j):
+            return abs(X[i] - X[j]) + abs(Y[i] - Y[j])
+
+        self._distance = distance if cache is None else lru_cache(maxsize=cache)(distance)
+
+    @property
+    def n(self):
+        """Nombre de clients (le centre n'est pas compté)."""
+        return len(self.coords) - 1
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __getitem__(self, key):
+        # inst[(i, j)] -> distance (entier Python), inst[i] -> distances de i à
+        # tous les sommets, calculées à la volée
+        if isinstance(key, tuple):
+            i, j = key
+            return self._distance(i, j) if i <= j else self._distance(j, i)
+        return self.dist_many(key, slice(None))
+
+    def dist_many(self, i, js):
+        """Distances du sommet i aux sommets js (array int64), en une
+        opération vectorisée."""
+        c = self.coords
+        return np.abs(c[js].astype(np.int64) - c[i].astype(np.int64)).sum(axis=-1)
+
+    def cache_info(self):
+        """Statistiques du cache (voir functools.lru_cache), None sans cache."""
+        return self._distance.cache_info() if hasattr(self._distance, "cache_info") else None
+
+    def keys(self):
+        return range(len(self.coords))
+
+
+def manhattan_matrix(coords):
+    """
+    Calcule la matrice des distances de Manhattan entre tous les points de
+    coords (array k x 2) par diffusion (broadcast) numpy.
+    """
+    c = np.asarray(coords, dtype=np.int32)
+    D = np.abs(c[:, None, 0] - c[None, :, 0])
+    D += np.abs(c[:, None, 1] - c[None, :, 1])
+    return D
+
+
+def distance_matrix(distances):
+    """
+    Retourne la matrice numpy des distances à partir de D (liste de listes,
+    dictionnaire de dictionnaires indexés par 0..n-1, Instance ou LazyInstance).
+    """
+    if hasattr(distances, "D"):
+        return np.asarray(distances.D)
+    if hasattr(distances, "coords"):
+        return manhattan_matrix(distances.coords)
+    n = len(distances)
+    return np.array([[distances[i][j] for j in range(n)] for i in range(n)])
+
+
+def generate_coords(n, seed=None):
+    """
+    Même tirage que generate_instance (n clients + 1 centre au milieu d'une
+    grille n^2 x n^2); retourne l'array int32 des coordonnées. Au-delà de
+    2^15 clients, le côté de la grille est limité à 2^30 pour que les
+    coordonnées tiennent en int32.
+    """
+    cote = min(n**2, 2**30)
+    rng = np.random.default_rng(seed)
+    coords = np.empty((n + 1, 2), dtype=np.int32)
+    coords[0] = (cote // 2, cote // 2)
+    coords[1:] = rng.integers(0, cote, size=(n, 2))
+    return coords
+
+
+def generate_dense_instance(n, seed=None):
+    """
+    Même tirage que generate_instance mais retourne une Instance dense au lieu
+    des dictionnaires.
+    """
+    return Instance(generate_coords(n, seed))
+
+
+def generate_lazy_instance(n, seed=None, cache=None):
+    """
+    Même tirage que generate_dense_instance mais retourne une LazyInstance,
+    pour les instances trop grandes pour une matrice des distances.
+    """
+    return LazyInstance(generate_coords(n, seed), cache)
+
+def create_shared_array(shape, dtype, fill=None):
+    """
+    Crée un array numpy dans un segment de mémoire partagée afin que des
+    processus fils puissent y accéder sans copie (ni sérialisation).
+    Retourne le couple (segment, array); le segment doit être conservé tant
+    que l'array est utilisé, puis fermé (close) et libéré (unlink).
+    """
+    dtype = np.dtype(dtype)
+    taille = max(int(np.prod(shape)) * dtype.itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=taille)
+    arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    if fill is not None:
+        arr[...] = fill
+    return shm, arr
+
+
+def attach_shared_array(name, shape, dtype):
+    """
+    Attache dans un processus fils l'array partagé créé par create_shared_array
+    (name est l'attribut name du segment). Retourne le couple (segment, array).
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
 def check_solution(tour, n):
     """
     Vérifie qu'un circuit 'tour' visite:
@@ -47,16 +223,92 @@ def evaluate_solution(tour, dist):
     """
     Calcule la somme des distances pour une liste de sommets 'tour'.
     """
+    if hasattr(dist, "D"):
+        t = np.asarray(tour)
+        return int(dist.D[t[:-1], t[1:]].sum(dtype=np.int64))
+    if hasattr(dist, "coords"):
+        # Sans matrice (LazyInstance): distances calculées sur les coordonnées
+        c = np.asarray(dist.coords, dtype=np.int64)[np.asarray(tour)]
+        return int(np.abs(c[1:] - c[:-1]).sum())
     cost = 0
     for i in range(len(tour) - 1):
         cost += dist[(tour[i], tour[i+1])]
     return cost
 
 
+def _tableau_tournees(tours):
+    """
+    Tournées sous forme d'array 2-D (une tournée par ligne), ou None si elles
+    n'ont pas toutes la même longueur.
+    """
+    if isinstance(tours, np.ndarray):
+        return tours.reshape(len(tours), -1)
+    if len({len(t) for t in tours}) > 1:
+        return None
+    return np.asarray(tours, dtype=np.int64).reshape(len(tours), -1)
+
+
+def check_solutions(tours, n):
+    """
+    Version groupée de check_solution: 'tours' est un array 2-D (une tournée
+    par ligne) ou une liste de tournées. Retourne le masque (array de booléens)
+    des tournées valides.
+    """
+    T = _tableau_tournees(tours)
+    if T is None:
+        return np.array([check_solution(list(t), n) for t in tours], dtype=bool)
+    if T.shape[1] != n + 2:
+        return np.zeros(len(T), dtype=bool)
+    # Clients triés de chaque tournée: exactement 1..n
+    clients = np.sort(T[:, 1:-1], axis=1)
+    return (T[:, 0] == 0) & (T[:, -1] == 0) & np.all(clients == np.arange(1, n + 1), axis=1)
+
+
+def evaluate_solutions(tours, dist):
+    """
+    Version groupée de evaluate_solution: 'tours' est un array 2-D (une
+    tournée par ligne) ou une liste de tournées, éventuellement de longueurs
+    différentes. Les coûts sont calculés en une seule indexation de la matrice
+    des distances (ou des coordonnées pour une LazyInstance).
+    Retourne l'array (int64) des coûts.
+    """
+    if len(tours) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if not hasattr(dist, "D") and not hasattr(dist, "coords"):
+        return np.array([evaluate_solution(t, dist) for t in tours], dtype=np.int64)
+    T = _tableau_tournees(tours)
+    if T is None:
+        # Longueurs différentes: arêtes de toutes les tournées mises bout à
+        # bout, puis sommées tournée par tournée
+        longueurs = np.array([len(t) - 1 for t in tours])
+        A = np.concatenate([np.asarray(t[:-1], dtype=np.int64) for t in tours])
+        B = np.concatenate([np.asarray(t[1:], dtype=np.int64) for t in tours])
+    else:
+        longueurs = None
+        A, B = T[:, :-1], T[:, 1:]
+    if hasattr(dist, "D"):
+        aretes = dist.D[A, B].astype(np.int64)
+    else:
+        c = np.asarray(dist.coords, dtype=np.int64)
+        aretes = np.abs(c[A] - c[B]).sum(axis=-1)
+    if longueurs is None:
+        return aretes.sum(axis=1)
+    # Les tournées réduites à un sommet n'ont pas d'arête
+    couts = np.zeros(len(tours), dtype=np.int64)
+    non_vides = longueurs > 0
+    debuts = np.concatenate(([0], np.cumsum(longueurs)[:-1]))[non_vides]
+    couts[non_vides] = np.add.reduceat(aretes, debuts)
+    return couts
+
+
 def convert_dist_format(dist_dict, n):
     """
     Convertit un dictionnaire de distances en une matrice 2D pour la programmation dynamique et l'ILP.
+    Une Instance est déjà indexable par D[i][j] et est retournée telle quelle.
     """
+    if hasattr(dist_dict, "D"):
+        return dist_dict
+
     # Initialiser une matrice de distance n x n
     matrix = [[0 for _ in range(n)] for _ in range(n)]
     